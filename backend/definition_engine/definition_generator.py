@@ -1,18 +1,12 @@
 # definition_engine/definition_generator.py
 
-import os
 import logging
-from dotenv import load_dotenv
-from groq import Groq
+from backend import llm_gateway
 from main_app.models import Language, Topic, Definition
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
-
 def generate_definition(language: str, topic: str) -> str:
     """
     Generate a short, beginner-friendly definition for a topic in a given language.
@@ -37,17 +31,15 @@ def generate_definition(language: str, topic: str) -> str:
     """
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
+        content = llm_gateway.chat(
+            [
                 {"role": "system", "content": "You are a concise programming topic explainer."},
                 {"role": "user", "content": prompt}
             ],
+            model="llama-3.1-8b-instant",
             max_tokens=200,
             temperature=0.7,
-        )
-
-        content = response.choices[0].message.content.strip()
+        ).strip()
 
         # Save in DB
         Definition.objects.create(topic=topic_obj, definition=content)
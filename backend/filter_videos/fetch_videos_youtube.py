@@ -1,6 +1,9 @@
 # fetch_videos_youtube.py
+import asyncio
 import sys
 import os
+import threading
+import time
 from asgiref.sync import sync_to_async
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -8,11 +11,19 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from filter_videos.filter_pipeline import VideoFilter
 from youtube_videos.youtube_fetcher import fetch_videos, process_video
 from main_app.models import Topic, Video, Transcript, Question
+from django.db.models import Exists, OuterRef
 from youtube_videos.utils import extract_video_id
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Fully processed videos never become incomplete again, so popular topics
+# can skip the database for a while. Only positive results are cached.
+COMPLETE_CACHE_TTL = int(os.getenv("COMPLETE_VIDEO_CACHE_TTL", "600"))
+COMPLETE_CACHE_MAX = 10000
+_complete_cache = {}
+_complete_cache_lock = threading.Lock()
+
 async def fetching_videos(language: str, topic_name: str):
     videos = await sync_to_async(fetch_videos)(f"{language} {topic_name}", max_results=5)
     if not videos:
@@ -24,12 +35,13 @@ async def fetching_videos(language: str, topic_name: str):
     )
 
     logger.info(f"Total videos fetched: {len(videos)}")
-    new_video_list = []
-
-    for vid in videos:
-        video_id = extract_video_id(vid["url"])
-        if not await found_video(video_id):
-            new_video_list.append(vid)
+    complete_ids = await fully_processed_video_ids(
+        [extract_video_id(vid["url"]) for vid in videos]
+    )
+    new_video_list = [
+        vid for vid in videos
+        if extract_video_id(vid["url"]) not in complete_ids
+    ]
 
     if not new_video_list:
         logger.info("No new videos to process.")
@@ -38,12 +50,15 @@ async def fetching_videos(language: str, topic_name: str):
     logger.info(f"Found {len(new_video_list)} new candidate videos. Applying AI filter...")
 
     MAX_CANDIDATES = 8
+    MAX_SELECTED = 3
     new_video_list = new_video_list[:MAX_CANDIDATES]
     logger.info(f"Limiting filtering to {len(new_video_list)} videos (max {MAX_CANDIDATES})")
 
     vf = VideoFilter()
-    filtered_videos = await sync_to_async(vf.filter_videos_batch)(new_video_list, language, topic_name)
-    filtered_videos = filtered_videos[:3]
+    filtered_videos = await sync_to_async(vf.filter_videos_batch)(
+        new_video_list, language, topic_name, target=MAX_SELECTED
+    )
+    filtered_videos = filtered_videos[:MAX_SELECTED]
 
     logger.info(f"Final selection: {len(filtered_videos)} videos to process")
 
@@ -58,34 +73,77 @@ async def fetching_videos(language: str, topic_name: str):
 
     logger.info("\nProcessing filtered videos...\n")
 
-    for video in filtered_videos:
-        await process_video(
+    # Videos run concurrently; downloads, Whisper and LLM calls are capped
+    # separately by youtube_videos.resource_limits.
+    tasks = [
+        asyncio.create_task(process_video(
             video['title'],
             video['description'],
             video['url'],
             topic_name,
             language
+        ))
+        for video in filtered_videos
+    ]
+
+    for finished in asyncio.as_completed(tasks):
+        try:
+            await finished
+        except Exception as e:
+            logger.error(f"Video processing failed: {e}")
+
+    logger.info(f"Processed {len(filtered_videos)} videos (transcribe + questions)")
+
+def _cached_complete_ids(video_ids) -> set:
+    now = time.monotonic()
+    with _complete_cache_lock:
+        return {vid for vid in video_ids if _complete_cache.get(vid, 0) > now}
+
+
+def _remember_complete_ids(video_ids):
+    expires = time.monotonic() + COMPLETE_CACHE_TTL
+    with _complete_cache_lock:
+        if len(_complete_cache) >= COMPLETE_CACHE_MAX:
+            now = time.monotonic()
+            for vid in [v for v, exp in _complete_cache.items() if exp <= now]:
+                del _complete_cache[vid]
+            if len(_complete_cache) >= COMPLETE_CACHE_MAX:
+                _complete_cache.clear()
+        for vid in video_ids:
+            _complete_cache[vid] = expires
+
+
+def _query_complete_ids(video_ids) -> set:
+    return set(
+        Video.objects.filter(video_id__in=video_ids)
+        .annotate(
+            has_transcript=Exists(Transcript.objects.filter(video=OuterRef("pk"))),
+            has_questions=Exists(Question.objects.filter(video=OuterRef("pk"))),
         )
+        .filter(has_transcript=True, has_questions=True)
+        .values_list("video_id", flat=True)
+    )
 
-    logger.info(f"Enqueued {len(filtered_videos)} videos for full processing (transcribe + questions)")
 
-async def found_video(video_ID: str) -> bool:
-    """Return True only if video, transcript, and questions exist for this video_ID."""
-    try:
-        video_exists = await sync_to_async(Video.objects.filter(video_id=video_ID).exists)()
-        if not video_exists:
-            return False
-        
-        transcript_exists = await sync_to_async(
-            Transcript.objects.filter(video__video_id=video_ID).exists
-        )()
-        
-        question_exists = await sync_to_async(
-            Question.objects.filter(video__video_id=video_ID).exists
-        )()
+async def fully_processed_video_ids(video_IDs) -> set:
+    """Return the subset of video_IDs that already have a video, transcript and questions."""
+    video_IDs = {vid for vid in video_IDs if vid}
+    complete = _cached_complete_ids(video_IDs)
+    missing = video_IDs - complete
 
-        return video_exists and transcript_exists and question_exists
-        
+    if not missing:
+        return complete
+
+    try:
+        found = await sync_to_async(_query_complete_ids)(list(missing))
     except Exception as e:
-        logger.error(f"Error checking video existence {video_ID}: {str(e)}")
-        return False
+        logger.error(f"Error checking video existence {sorted(missing)}: {str(e)}")
+        return complete
+
+    _remember_complete_ids(found)
+    return complete | found
+
+
+async def found_video(video_ID: str) -> bool:
+    """Return True only if video, transcript, and questions exist for this video_ID."""
+    return video_ID in await fully_processed_video_ids([video_ID])
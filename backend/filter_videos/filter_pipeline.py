@@ -1,166 +1,355 @@
 # --- filter_videos/filter_pipeline.py ---
 
 import asyncio
+import hashlib
 import json
 import os
+import re
 import sys
-import tempfile
 import yt_dlp
+from backend.youtube_videos.audio_cache import audio_cache
 from backend.youtube_videos.cookie_manager import rotate_cookies_and_download
-from groq import Groq
-from concurrent.futures import ThreadPoolExecutor
-from threading import Lock
+from backend import llm_gateway
+from backend.youtube_videos.transcript_source import caption_text_until, get_captions_sync
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Event, Lock
+from functools import lru_cache
 from typing import Dict, List
 import ffmpeg
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from main_app.models import PartialTranscript
 
-from youtube_videos.audio_transcriber import WhisperTranscriber
+from backend.youtube_videos.audio_transcriber import clip_batcher
 from youtube_videos.groq_transcript_analysis import analyze_with_groq
-from youtube_videos.youtube_api import search_youtube_videos
+from youtube_videos.youtube_api import search_many
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-
 import logging
 logger = logging.getLogger(__name__)
 
+STAGE2_CLIP_SECONDS = int(os.getenv("STAGE2_CLIP_SECONDS", "300"))
+STAGE1_WORKERS = int(os.getenv("STAGE1_WORKERS", "4"))
+STAGE2_WORKERS = int(os.getenv("STAGE2_WORKERS", "3"))
+METADATA_PASS_SCORE = 0.5
+
+KEYWORD_EXPANSION_TTL = int(os.getenv("KEYWORD_EXPANSION_TTL", str(7 * 24 * 3600)))
+KEYWORD_EXPANSION_NEGATIVE_TTL = int(os.getenv("KEYWORD_EXPANSION_NEGATIVE_TTL", str(6 * 3600)))
+
+pipeline_cache = caches["pipeline"]
+_expansion_locks: Dict[str, Lock] = {}
+_expansion_locks_guard = Lock()
+
+
+def _normalize_language(language: str) -> str:
+    language = language.strip().lower()
+    return "c++" if language == "cpp" else language
+
+
+@lru_cache(maxsize=256)
+def _metadata_matcher(language_norm: str, topic_norm: str):
+    """
+    Compiled (language, topic) patterns for Stage 1. The language must be a
+    whole token (so "c" does not match "c++" or "java" match "javascript"),
+    though a version number may follow it ("python3", "c++17"); topic
+    variants only need to start on a word boundary so plurals still match.
+    """
+    languages = [language_norm] + (["cpp"] if language_norm == "c++" else [])
+    language_re = re.compile(
+        r"(?<![a-z0-9+#])(?:" + "|".join(map(re.escape, languages)) + r")(?![a-z+#])"
+    )
+
+    topic_variants = {topic_norm, topic_norm.rstrip('s'), topic_norm.replace('basic ', ''), topic_norm.replace(' ', '')}
+    topic_variants = sorted((v for v in topic_variants if v), key=len, reverse=True)
+    topic_re = re.compile(r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, topic_variants)) + ")")
+
+    return language_re, topic_re
+
+
+def _expansion_cache_key(language_norm: str, topic_norm: str) -> str:
+    digest = hashlib.sha256(f"{language_norm}|{topic_norm}".encode()).hexdigest()
+    return f"keyword_expansion:{digest}"
+
+
+def _expansion_lock(key: str) -> Lock:
+    """One expansion per topic at a time in this process; the rest wait for the cached result."""
+    with _expansion_locks_guard:
+        return _expansion_locks.setdefault(key, Lock())
+
+
 class VideoFilter:
-    def filter_videos_batch(self, videos: List[Dict], language: str, topic: str) -> List[Dict]:
-        """Filter videos in parallel with organized filtering stages."""
-        lock = Lock()
+    def filter_videos_batch(self, videos: List[Dict], language: str, topic: str,
+                            target: int | None = None) -> List[Dict]:
+        """
+        Filter videos in parallel with organized filtering stages.
+        Stops as soon as `target` videos have passed and cancels the
+        Stage 2 work that is still pending.
+        """
         passed_videos = []
         failed_videos = []
 
         def process_video(video):
             try:
-                if self._check_metadata(video, language, topic):
-                    with lock:
-                        passed_videos.append(video)
-                    logger.info(f"Metadata passed: {video.get('title')}")
-                else:
-                    with lock:
-                        failed_videos.append(video)
-                    logger.info(f"Metadata failed: {video.get('title')}")
+                return self._check_metadata(video, language, topic)
             except Exception as e:
                 logger.error(f"Error processing video {video.get('title')}: {e}")
+                return None
 
         logger.info("=== STAGE 1: Metadata Filtering ===")
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            executor.map(process_video, videos)
+        with ThreadPoolExecutor(max_workers=STAGE1_WORKERS) as executor:
+            scores = list(executor.map(process_video, videos))
+
+        scored = [(score, video) for score, video in zip(scores, videos) if score is not None]
+        # Stable sort: best-scoring candidates first, ties keep search order.
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        for score, video in scored:
+            video["relevance_score"] = score
+            if score >= METADATA_PASS_SCORE:
+                passed_videos.append(video)
+                logger.info(f"Metadata passed: {video.get('title')}")
+            else:
+                failed_videos.append(video)
+                logger.info(f"Metadata failed: {video.get('title')}")
 
         logger.info(f"Metadata results: {len(passed_videos)} passed, {len(failed_videos)} failed")
 
+        if target is not None and len(passed_videos) >= target:
+            logger.info(f"Target of {target} reached after metadata filtering, skipping Stage 2")
+            return passed_videos
+
         if failed_videos:
             logger.info("=== STAGE 2: Processing Failed Videos ===")
-            for video in failed_videos:
-                try:
-                    logger.info(f"Processing failed video: {video.get('title')}")
-                    
-                    if self._check_transcript(video, language, topic):
-                        passed_videos.append(video)
-                        logger.info(f"Transcript passed: {video.get('title')}")
-                        continue
-                    
-                    if self._try_keyword_expansion(video, language, topic):
-                        passed_videos.append(video)
-                        logger.info(f"AI expansion passed: {video.get('title')}")
-                        continue
-                    
-                    logger.info(f"All stages failed: {video.get('title')}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing failed video {video.get('title')}: {e}")
+            stop = Event()
+            executor = ThreadPoolExecutor(max_workers=STAGE2_WORKERS)
+            futures = {
+                executor.submit(self._deep_check, video, language, topic, stop): video
+                for video in failed_videos
+            }
+
+            try:
+                for future in as_completed(futures):
+                    video = futures[future]
+                    try:
+                        if future.result():
+                            passed_videos.append(video)
+                    except Exception as e:
+                        logger.error(f"Error processing failed video {video.get('title')}: {e}")
+
+                    if target is not None and len(passed_videos) >= target:
+                        logger.info(f"Target of {target} reached, cancelling remaining Stage 2 work")
+                        stop.set()
+                        break
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
 
         logger.info(f"Final results: {len(passed_videos)} total passed videos")
         return passed_videos
 
-    def _check_metadata(self, video: Dict, language: str, topic: str) -> bool:
-        """Relaxed metadata filtering for better recall."""
+    def _deep_check(self, video: Dict, language: str, topic: str, stop: Event) -> bool:
+        """Stage 2 for a single video: transcript analysis, then keyword expansion."""
+        if stop.is_set():
+            return False
+
+        logger.info(f"Processing failed video: {video.get('title')}")
+
+        if self._check_transcript(video, language, topic, stop):
+            logger.info(f"Transcript passed: {video.get('title')}")
+            return True
+
+        if stop.is_set():
+            return False
+
+        if self._try_keyword_expansion(video, language, topic):
+            logger.info(f"AI expansion passed: {video.get('title')}")
+            return True
+
+        logger.info(f"All stages failed: {video.get('title')}")
+        return False
+
+    def _check_metadata(self, video: Dict, language: str, topic: str) -> float:
+        """
+        Relaxed metadata relevance score in [0, 1]. Any field mentioning both
+        the language and the topic scores at least METADATA_PASS_SCORE;
+        partial mentions score lower so Stage 2 can take the best misses first.
+        """
         logger.info(f"Checking metadata for: {video.get('title')}")
 
-        language_norm = "c++" if language.lower() == "cpp" else language.lower()
-        topic_norm = topic.lower()
+        language_re, topic_re = _metadata_matcher(_normalize_language(language), " ".join(topic.lower().split()))
+
+        def hits(text):
+            return bool(language_re.search(text)), bool(topic_re.search(text))
 
         title = video.get('title', '').lower()
         description = video.get('description', '').lower()
         tags = [t.lower() for t in video.get('tags', [])]
 
-        def fuzzy_match(text, words):
-            return any(w in text for w in words)
+        title_lang, title_topic = hits(title)
+        desc_lang, desc_topic = hits(description)
 
-        topic_variants = [topic_norm, topic_norm.rstrip('s'), topic_norm.replace('basic ', ''), topic_norm.replace(' ', '')]
-
-        if language_norm in title and fuzzy_match(title, topic_variants):
+        score = 0.0
+        if title_lang and title_topic:
             logger.info(f"Metadata title match: {video.get('title')}")
-            return True
-
-        if language_norm in description and fuzzy_match(description, topic_variants):
+            score += 1.0
+        if desc_lang and desc_topic:
             logger.info("Metadata description match")
-            return True
-
-        if tags and any(language_norm in t and fuzzy_match(t, topic_variants) for t in tags):
+            score += 0.6
+        if any(all(hits(t)) for t in tags):
             logger.info("Metadata tag match")
-            return True
+            score += 0.5
 
-        logger.warning(f"No metadata match for: {video.get('title')}")
-        return False
+        if score == 0:
+            partial = 0.3 * title_topic + 0.1 * title_lang + 0.15 * desc_topic + 0.05 * desc_lang
+            score = min(partial, METADATA_PASS_SCORE - 0.05)
+            logger.warning(f"No metadata match for: {video.get('title')} (score {score:.2f})")
 
-    def _check_transcript(self, video: Dict, language: str, topic: str) -> bool:
+        return min(score, 1.0)
+
+    def _check_transcript(self, video: Dict, language: str, topic: str, stop: Event | None = None) -> bool:
         """Check if video passes transcript analysis."""
         logger.info(f"Transcript analysis for: {video.get('title')}")
 
         title = video.get('title', '').lower()
         description = video.get('description', '').lower()
         tags = video.get('tags', [])
-        
+
+        video_id = video['url'].split('=')[-1]
+        clip_variant = f"head{STAGE2_CLIP_SECONDS}"
+
+        def cancelled():
+            if stop is not None and stop.is_set():
+                logger.info(f"Transcript analysis cancelled: {video.get('title')}")
+                return True
+            return False
+
         try:
-            video_id = video['url'].split('=')[-1]
-            temp_audio_dir = tempfile.gettempdir()
-            full_audio_path = os.path.join(temp_audio_dir, f"full_audio_{video_id}.mp3")
-            short_audio_path = os.path.join(temp_audio_dir, f"short_audio_{video_id}.mp3")
+            # Captions make the audio download and Whisper run unnecessary.
+            captions = get_captions_sync(video_id)
+            if captions:
+                transcript = caption_text_until(captions, STAGE2_CLIP_SECONDS)
+                if cancelled():
+                    return False
+                return self._judge_transcript(transcript, language, topic, title, description, tags)
+
+            # Fetch only the first STAGE2_CLIP_SECONDS; fall back to a full
+            # download + trim if the ranged download is not possible. The full
+            # audio stays in the audio cache for the transcript pipeline.
+            short_audio_path = audio_cache.get(video_id, clip_variant) or audio_cache.fill(
+                video_id, clip_variant,
+                lambda tmp_path: self._download_audio(video['url'], tmp_path, clip_seconds=STAGE2_CLIP_SECONDS, stop=stop)
+            )
 
-            if not self._download_audio(video['url'], full_audio_path):
-                return False
+            if not short_audio_path:
+                if cancelled():
+                    return False
+
+                logger.warning("Partial audio download failed, downloading full audio")
+
+                full_audio_path = audio_cache.get(video_id) or audio_cache.fill(
+                    video_id, "full",
+                    lambda tmp_path: self._download_audio(video['url'], tmp_path, stop=stop)
+                )
+                if not full_audio_path:
+                    return False
+
+                short_audio_path = audio_cache.fill(
+                    video_id, clip_variant,
+                    lambda tmp_path: self._trim_audio(full_audio_path, tmp_path, STAGE2_CLIP_SECONDS)
+                )
+                if not short_audio_path:
+                    return False
 
-            if not self._trim_audio(full_audio_path, short_audio_path):
-                self._cleanup_files([full_audio_path])
+            if cancelled():
                 return False
 
-            transcriber = WhisperTranscriber()
-            transcript = transcriber.transcribe_audio(short_audio_path)
+            # Clips from concurrent Stage 2 checks are decoded in one batch.
+            transcript = clip_batcher.transcribe(short_audio_path)
 
-            self._cleanup_files([full_audio_path, short_audio_path])
+            if cancelled():
+                return False
 
-            if transcript and analyze_with_groq(transcript, language, topic, title, description, tags):
-                logger.info("Transcript analysis detected relevant content")
+            if self._judge_transcript(transcript, language, topic, title, description, tags):
+                self._save_partial_transcript(video_id, transcript, short_audio_path, video.get('duration'))
                 return True
-            else:
-                logger.warning("Transcript analysis did not detect relevant content")
-                return False
+            return False
 
         except Exception as e:
             logger.error(f"Transcript analysis failed: {e}")
             return False
 
+        finally:
+            audio_cache.discard(video_id, clip_variant)
+
+    def _judge_transcript(self, transcript: str, language: str, topic: str,
+                          title: str, description: str, tags: List[str]) -> bool:
+        if transcript and analyze_with_groq(transcript, language, topic, title, description, tags):
+            logger.info("Transcript analysis detected relevant content")
+            return True
+
+        logger.warning("Transcript analysis did not detect relevant content")
+        return False
+
+    def _save_partial_transcript(self, video_id: str, transcript: str, clip_path: str,
+                                 video_duration: float | None = None):
+        """Keep the clip transcript so the full pipeline only transcribes what comes after it."""
+        try:
+            covered_until = float(ffmpeg.probe(clip_path)["format"]["duration"])
+            PartialTranscript.objects.update_or_create(
+                video_id=video_id,
+                defaults={
+                    "content": transcript.strip(),
+                    "covered_until": covered_until,
+                    # A short clip may just be a truncated download, so only
+                    # the video's known duration can show the clip covers it all.
+                    "is_complete": video_duration is not None and covered_until >= video_duration - 1,
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Could not save partial transcript for {video_id}: {e}")
+
     def _try_keyword_expansion(self, video: Dict, language: str, topic: str) -> bool:
-        """AI keyword expansion and relaxed re-search if metadata and transcript fail."""
+        """
+        AI keyword expansion and relaxed re-search if metadata and transcript fail.
+        The outcome depends only on (language, topic), so it is computed once
+        per topic and shared through the pipeline cache.
+        """
         logger.info(f"Starting keyword expansion for: {video.get('title')}")
 
-        if not client:
+        language_norm = _normalize_language(language)
+        topic_norm = " ".join(topic.lower().split())
+        key = _expansion_cache_key(language_norm, topic_norm)
+
+        with _expansion_lock(key):
+            cached = pipeline_cache.get(key)
+            if cached is not None:
+                logger.info(f"Keyword expansion cache hit for {language_norm} / {topic_norm}: {cached}")
+                return cached
+
+            found = self._run_keyword_expansion(language_norm, topic_norm)
+            if found is not None:
+                pipeline_cache.set(
+                    key,
+                    found,
+                    KEYWORD_EXPANSION_TTL if found else KEYWORD_EXPANSION_NEGATIVE_TTL
+                )
+            return bool(found)
+
+    def _run_keyword_expansion(self, language_norm: str, topic_norm: str) -> bool | None:
+        """Search YouTube with AI-expanded keywords. Returns None if the search could not run."""
+        if not llm_gateway.is_configured():
             logger.error("Groq client not available.")
-            return False
+            return None
 
         try:
-            language_norm = "c++" if language.lower() == "cpp" else language.lower()
-            topic_norm = topic.lower()
-
             keywords = self._generate_expanded_keywords(language_norm, topic_norm)
             logger.info(f"Generated {len(keywords)} expanded keywords: {keywords}")
 
-            for term in keywords:
-                search_query = f"{language_norm} {term}"
-                search_results = search_youtube_videos(search_query, max_results=5)
+            # All expansion searches run concurrently over pooled connections.
+            queries = [f"{language_norm} {term}" for term in keywords]
+            all_results = async_to_sync(search_many)(queries, 5)
+
+            for term, search_results in zip(keywords, all_results):
                 if not search_results:
                     logger.debug(f"No results for expansion term: {term}")
                     continue
@@ -178,14 +367,16 @@ class VideoFilter:
 
         except Exception as e:
             logger.error(f"Keyword expansion failed: {e}")
-            return False
+            return None
 
-    def _download_audio(self, url: str, output_path: str) -> bool:
-        """Download audio from YouTube video."""
+    def _download_audio(self, url: str, output_path: str, clip_seconds: int | None = None,
+                        stop: Event | None = None) -> bool:
+        """Download audio from YouTube video, optionally only the first `clip_seconds`."""
 
         try:
             cookie_dir = os.getenv("YTDLP_COOKIES_DIR", "cookies")
-            success = rotate_cookies_and_download(url, output_path, cookie_dir)
+            section = (0, clip_seconds) if clip_seconds else None
+            success = rotate_cookies_and_download(url, output_path, cookie_dir, section, cancel=stop)
 
             if not success:
                 logger.error(f"Audio download failed for {url}")
@@ -229,14 +420,12 @@ class VideoFilter:
         "python recursion practice problems"]
         """
 
-        response = client.chat.completions.create(
+        text = llm_gateway.chat(
+            [{"role": "user", "content": prompt}],
             model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
             temperature=0.5,
             max_tokens=200,
-        )
-
-        text = response.choices[0].message.content.strip()
+        ).strip()
         text = text.replace("```json", "").replace("```", "").strip()
         
         if "[" in text and "]" in text:
@@ -256,12 +445,3 @@ class VideoFilter:
             keywords.append(language)
 
         return keywords[:8]
-
-    def _cleanup_files(self, file_paths: List[str]):
-        """Clean up temporary files."""
-        for file_path in file_paths:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                logger.warning(f"Could not remove temporary file {file_path}: {e}")
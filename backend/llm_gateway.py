@@ -0,0 +1,281 @@
+# backend/llm_gateway.py
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from dotenv import load_dotenv
+from groq import APIConnectionError, APIStatusError, Groq, RateLimitError
+
+from backend.youtube_videos.resource_limits import llm_slots
+
+try:
+    import fcntl
+except ImportError:  # Windows: the rate limit is then shared by threads only
+    fcntl = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Every Groq call in the project goes through chat(). It reuses one client
+# per process and paces requests with a token bucket that all threads and
+# worker processes on the host share through a locked state file, so the
+# combined load stays inside the account's rate limits.
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+DEFAULT_MODEL = os.getenv("GROQ_MODEL_NAME", "llama-3.1-8b-instant")
+LLM_RPM = int(os.getenv("LLM_RPM", "30"))
+LLM_TPM = int(os.getenv("LLM_TPM", "6000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_RATE_FILE = os.getenv("LLM_RATE_FILE", os.path.join(settings.BASE_DIR, "cache", "llm_rate.json"))
+
+CHARS_PER_TOKEN = 4
+
+# Response cache. Temperature-0 calls are cached unless the caller passes
+# cache=False; other calls only when they pass cache=True. Entries expire
+# after LLM_CACHE_TTL and the "llm" cache culls the oldest past MAX_ENTRIES.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+STATS_PREFIX = "llm_stats:"
+STATS_FIELDS = ("hits", "misses", "saved_ms", "saved_tokens")
+
+llm_cache = caches["llm"]
+
+
+class LLMUnavailable(Exception):
+    """Raised when no Groq API key is configured."""
+
+
+class TokenBucket:
+    """
+    Requests-per-minute and tokens-per-minute buckets kept in a JSON file
+    under an exclusive flock, so every process on the host draws from the
+    same budget. A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, path: str, rpm: int, tpm: int):
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._local_state: dict = {}
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            if fcntl is None:
+                yield self._local_state
+                return
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except json.JSONDecodeError:
+                        state = {}
+
+                    yield state
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state: dict, now: float):
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["requests"] = min(self.rpm, state.get("requests", self.rpm) + elapsed * self.rpm / 60)
+        state["tokens"] = min(self.tpm, state.get("tokens", self.tpm) + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    def acquire(self, tokens: int):
+        """Block until one request and `tokens` tokens are available, then take them."""
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+
+        while True:
+            with self._state() as state:
+                now = time.time()
+                self._refill(state, now)
+
+                wait = state.get("blocked_until", 0) - now
+                if wait <= 0:
+                    has_request = not self.rpm or state["requests"] >= 1
+                    has_tokens = not self.tpm or state["tokens"] >= tokens
+                    if has_request and has_tokens:
+                        if self.rpm:
+                            state["requests"] -= 1
+                        if self.tpm:
+                            state["tokens"] -= tokens
+                        return
+
+                    wait = max(
+                        (1 - state["requests"]) * 60 / self.rpm if self.rpm else 0,
+                        (tokens - state["tokens"]) * 60 / self.tpm if self.tpm else 0,
+                    )
+
+            # Poll rather than sleep the whole wait: settle() may refund tokens early.
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage of a call is known."""
+        if not self.tpm or actual == estimated:
+            return
+        with self._state() as state:
+            self._refill(state, time.time())
+            state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+
+    def block(self, seconds: float):
+        """Pause every caller on the host, e.g. after a 429 with Retry-After."""
+        with self._state() as state:
+            state["blocked_until"] = max(state.get("blocked_until", 0), time.time() + seconds)
+
+
+rate_limiter = TokenBucket(LLM_RATE_FILE, LLM_RPM, LLM_TPM)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    return bool(GROQ_API_KEY)
+
+
+def get_client() -> Groq:
+    """The process-wide Groq client. Its own retries are off; chat() retries through the rate limiter."""
+    global _client
+
+    if not GROQ_API_KEY:
+        raise LLMUnavailable("GROQ_API_KEY is not set")
+
+    with _client_lock:
+        if _client is None:
+            _client = Groq(api_key=GROQ_API_KEY, max_retries=0, timeout=LLM_TIMEOUT)
+        return _client
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int) -> int:
+    return sum(len(m.get("content", "")) for m in messages) // CHARS_PER_TOKEN + max_tokens
+
+
+def _retry_after(error: APIStatusError) -> float | None:
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, 2 ** attempt)
+
+
+def _cache_key(messages: list[dict], model: str, temperature: float, max_tokens: int) -> str:
+    payload = json.dumps([model, temperature, max_tokens, messages], sort_keys=True)
+    return "llm:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _count(field: str, amount: int = 1):
+    """Bump a cache metric. Shared by all processes; concurrent bumps may occasionally be lost."""
+    key = STATS_PREFIX + field
+    llm_cache.add(key, 0, None)
+    try:
+        llm_cache.incr(key, amount)
+    except ValueError:
+        llm_cache.set(key, amount, None)
+
+
+def cache_stats() -> dict:
+    """Hit rate of the response cache and the latency and tokens it saved."""
+    values = llm_cache.get_many([STATS_PREFIX + f for f in STATS_FIELDS])
+    hits, misses, saved_ms, saved_tokens = (values.get(STATS_PREFIX + f, 0) for f in STATS_FIELDS)
+    lookups = hits + misses
+    return {
+        "enabled": LLM_CACHE_ENABLED,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0,
+        "saved_seconds": saved_ms / 1000,
+        "saved_tokens": saved_tokens,
+    }
+
+
+def chat(messages: list[dict], model: str = DEFAULT_MODEL, temperature: float = 0,
+         max_tokens: int = 500, cache: bool | None = None) -> str:
+    """
+    Run a chat completion and return the message text. Identical cacheable
+    requests are answered from the response cache. Otherwise it waits for
+    rate-limit budget, and retries 429s (honouring Retry-After), 5xx and
+    connection errors up to LLM_MAX_RETRIES times.
+    """
+    use_cache = LLM_CACHE_ENABLED and (cache if cache is not None else temperature == 0)
+    if not use_cache:
+        return _complete(messages, model, temperature, max_tokens)[0]
+
+    key = _cache_key(messages, model, temperature, max_tokens)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        _count("hits")
+        _count("saved_ms", cached["latency_ms"])
+        _count("saved_tokens", cached["tokens"])
+        return cached["content"]
+
+    _count("misses")
+    start = time.monotonic()
+    content, tokens = _complete(messages, model, temperature, max_tokens)
+    llm_cache.set(key, {
+        "content": content,
+        "latency_ms": int((time.monotonic() - start) * 1000),
+        "tokens": tokens,
+    }, LLM_CACHE_TTL)
+    return content
+
+
+def _complete(messages: list[dict], model: str, temperature: float, max_tokens: int) -> tuple[str, int]:
+    """One rate-limited completion; returns (text, total tokens used)."""
+    client = get_client()
+    estimated = estimate_tokens(messages, max_tokens)
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        rate_limiter.acquire(estimated)
+        try:
+            with llm_slots:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+        except RateLimitError as e:
+            # A rejected call used no tokens; give the estimate back.
+            rate_limiter.settle(estimated, 0)
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = _retry_after(e) or _backoff(attempt + 2)
+            rate_limiter.block(delay)
+            logger.warning(f"Groq rate limit hit, pausing LLM calls for {delay:.1f}s")
+            continue
+        except (APIConnectionError, APIStatusError) as e:
+            rate_limiter.settle(estimated, 0)
+            retryable = isinstance(e, APIConnectionError) or e.status_code >= 500
+            if not retryable or attempt == LLM_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"Groq request failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None) or estimated
+        rate_limiter.settle(estimated, used)
+
+        return response.choices[0].message.content, used
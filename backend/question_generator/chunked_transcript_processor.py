@@ -1,18 +1,14 @@
 #question_generator/chunked_transcript_processor.py
 
-import os
-import time
-from groq import Groq
 import tiktoken
 from question_generator.prompts import get_chunk_prompt
+from backend import llm_gateway
 
 from main_app.models import Video, Question
 
 import logging
 logger = logging.getLogger(__name__)
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
 def count_tokens(text: str) -> int:
     enc = tiktoken.get_encoding("cl100k_base")
     return len(enc.encode(text))
@@ -44,7 +40,6 @@ def process_transcript(video_id: str):
 
     transcript = video.transcript.content
     chunks = chunk_text(transcript, max_tokens=5000)
-    client = Groq(api_key=GROQ_API_KEY)
 
     all_questions_text = []
 
@@ -52,28 +47,13 @@ def process_transcript(video_id: str):
         is_last = (i == len(chunks))
         prompt = get_chunk_prompt(chunk, i, len(chunks), is_last)
 
-        max_retries = 3
-        backoff = 10
-
-        for attempt in range(max_retries):
-            try:
-                response = client.chat.completions.create(
-                    model="llama-3.1-8b-instant",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.2,
-                    max_tokens=800
-                )
-                break
-            except Exception as e:
-                if "429" in str(e) and attempt < max_retries - 1:
-                    logger.warning(f"429 Too Many Requests, retrying in {backoff} sec...")
-                    time.sleep(backoff)
-                    backoff *= 2
-                else:
-                    logger.error(f"LLM request failed: {e}")
-                    raise
-
-        reply = response.choices[0].message.content.strip()
+        # Rate limits and retries are handled by the LLM gateway.
+        reply = llm_gateway.chat(
+            [{"role": "user", "content": prompt}],
+            model="llama-3.1-8b-instant",
+            temperature=0.2,
+            max_tokens=800
+        ).strip()
         if is_last:
             all_questions_text.append(reply)
         logger.info(f"Part {i}/{len(chunks)} processed.")
@@ -4,20 +4,19 @@ from asgiref.sync import sync_to_async
 from main_app.models import Video, Question
 from question_generator.chunked_transcript_processor import count_tokens, process_transcript
 import json
-import os
-from dotenv import load_dotenv
-from langchain_core.runnables import RunnableSequence
-from langchain_groq import ChatGroq
 from .prompt_template import question_prompt
+from backend import llm_gateway
 
 import logging
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
-model_name = os.getenv("GROQ_MODEL_NAME", "llama-3.1-8b-instant")
-llm = ChatGroq(model_name=model_name, api_key=groq_api_key, temperature=0.7)
-chain = RunnableSequence(question_prompt | llm)
+
+def _invoke_chain(summary: str) -> str:
+    return llm_gateway.chat(
+        [{"role": "user", "content": question_prompt.format(summary=summary)}],
+        temperature=0.7,
+        max_tokens=1500,
+    )
 
 
 async def generate_questions(summary: str, video_id: str):
@@ -32,12 +31,13 @@ async def generate_questions(summary: str, video_id: str):
     total_tokens = count_tokens(summary)
     logger.info(f"Total tokens in summary: {total_tokens}")
 
+    # LLM calls run off the shared sync thread so concurrent videos overlap.
     if total_tokens > 5000:
-        await sync_to_async(process_transcript)(video_id)
+        await sync_to_async(process_transcript, thread_sensitive=False)(video_id)
         logger.info("Processed transcript in chunks.")
         return
     else:
-        raw_output = await sync_to_async(lambda: chain.invoke({"summary": summary}).content)()
+        raw_output = await sync_to_async(_invoke_chain, thread_sensitive=False)(summary)
 
         try:
             questions_json = json.loads(raw_output)
@@ -2,8 +2,7 @@
 
 from typing import Dict, List
 from main_app.models import Language, Roadmap
-from groq import Groq
-import os
+from backend import llm_gateway
 import logging
 logger = logging.getLogger(__name__)
 
@@ -19,9 +18,6 @@ def generate_roadmap(language_name: str) -> Dict[str, List[str]]:
         logger.info(f"Fetched existing roadmap for {language_name} from DB with {len(topics)} topics.")
         return {"topics": topics}
     
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-    client = Groq(api_key=GROQ_API_KEY)
-
     prompt = f"""
         Generate a structured learning roadmap for {language_name}.
         The roadmap must follow this order:
@@ -47,17 +43,15 @@ def generate_roadmap(language_name: str) -> Dict[str, List[str]]:
     """
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
+        content = llm_gateway.chat(
+            [
                 {"role": "system", "content": "You are a roadmap generator for learning programming languages."},
                 {"role": "user", "content": prompt}
             ],
+            model="llama-3.1-8b-instant",
             max_tokens=800,
             temperature=0.7
         )
-
-        content = response.choices[0].message.content
         roadmap_topics = [
             line.strip()
             for line in content.split("\n")
@@ -1,115 +1,526 @@
-import threading
-import queue
-import logging
-
-from asgiref.sync import async_to_sync
-from backend.filter_videos.fetch_videos_youtube import fetching_videos
-from main_app.models import Topic
-from django.db import transaction
-
-logger = logging.getLogger(__name__)
-
-# FIFO queue
-task_queue = queue.Queue()
-queued_tasks = set()
-
-queue_lock = threading.Lock()
-_worker_started = False
-_worker_lock = threading.Lock()
-
-
-def worker_loop():
-    logger.info("FIFO background worker started")
-
-    while True:
-        user_id, language, topic_name = task_queue.get()
-
-        with queue_lock:
-            queued_tasks.discard((user_id, language, topic_name))
-
-        try:
-            with transaction.atomic():
-                topic = Topic.objects.select_for_update().get(
-                    name=topic_name,
-                    language__name=language
-                )
-
-                if topic.is_fully_processed:
-                    task_queue.task_done()
-                    continue
-
-                topic.is_processing = True
-                topic.save(update_fields=["is_processing"])
-
-            async_to_sync(fetching_videos)(language, topic_name)
-
-            topic.is_fully_processed = True
-            topic.is_processing = False
-            topic.save(update_fields=["is_fully_processed", "is_processing"])
-
-            logger.info(
-                f"Completed topic: {topic_name} (user={user_id})"
-            )
-
-        except Exception as e:
-            logger.exception(
-                f"Pipeline failed for user={user_id}, topic={topic_name}: {e}"
-            )
-            Topic.objects.filter(
-                name=topic_name,
-                language__name=language
-            ).update(is_processing=False)
-
-        finally:
-            task_queue.task_done()
-
-
-def upsert_user_task(user_id: int, language: str, topic_name: str):
-    """
-    Rules:
-    - same user + same topic → no change
-    - same user + different topic → replace queued task
-    - running task is NOT touched
-    """
-    new_key = (user_id, language, topic_name)
-
-    with queue_lock:
-        if new_key in queued_tasks:
-            return "unchanged"
-
-        new_queue = queue.Queue()
-
-        while not task_queue.empty():
-            item = task_queue.get_nowait()
-            queued_user_id, _, _ = item
-
-            if queued_user_id == user_id:
-                queued_tasks.discard(item)
-            else:
-                new_queue.put(item)
-
-        while not new_queue.empty():
-            task_queue.put(new_queue.get())
-
-        queued_tasks.add(new_key)
-        task_queue.put(new_key)
-
-        return "replaced"
-
-
-def start_worker_once():
-    global _worker_started
-
-    with _worker_lock:
-        if _worker_started:
-            return
-
-        Topic.objects.filter(is_processing=True).update(is_processing=False)
-
-        t = threading.Thread(
-            target=worker_loop,
-            daemon=True
-        )
-        t.start()
-
-        _worker_started = True
+import os
+import socket
+import threading
+import time
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from backend.filter_videos.fetch_videos_youtube import fetching_videos
+from main_app.models import Language, PipelineJob, Roadmap, Topic
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Jobs live in the PipelineJob table so every web process enqueues into,
+# and every worker process drains, the same queue.
+LEASE_SECONDS = int(os.getenv("PIPELINE_LEASE_SECONDS", "600"))
+POLL_INTERVAL = float(os.getenv("PIPELINE_POLL_INTERVAL", "2"))
+MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "3"))
+POOL_SIZE = int(os.getenv("PIPELINE_WORKERS", "2"))
+STATS_WINDOW_SECONDS = 3600
+CLAIM_SCAN_LIMIT = 50
+
+# Smooth weighted round-robin shares between priority classes, e.g. "8,3,1"
+# serves roughly 8 interactive jobs for every 3 prefetch and 1 backfill job
+# while all three classes have work queued.
+DEFAULT_CLASS_WEIGHTS = {
+    PipelineJob.PRIORITY_INTERACTIVE: 8,
+    PipelineJob.PRIORITY_PREFETCH: 3,
+    PipelineJob.PRIORITY_BACKFILL: 1,
+}
+
+
+def _parse_class_weights(raw: str) -> dict:
+    """
+    Read PIPELINE_CLASS_WEIGHTS. Classes with a missing or invalid value
+    keep their default weight, so every priority class is always scheduled.
+    """
+    weights = dict(DEFAULT_CLASS_WEIGHTS)
+    values = [v.strip() for v in raw.split(",")]
+
+    for priority, value in zip(DEFAULT_CLASS_WEIGHTS, values):
+        try:
+            weight = int(value)
+            if weight < 1:
+                raise ValueError
+            weights[priority] = weight
+        except ValueError:
+            logger.warning(f"Invalid PIPELINE_CLASS_WEIGHTS value {value!r} for priority {priority}, using default")
+
+    if len(values) != len(DEFAULT_CLASS_WEIGHTS):
+        logger.warning(
+            f"PIPELINE_CLASS_WEIGHTS={raw!r} should have {len(DEFAULT_CLASS_WEIGHTS)} values; "
+            f"using {list(weights.values())}"
+        )
+    return weights
+
+
+CLASS_WEIGHTS = _parse_class_weights(os.getenv("PIPELINE_CLASS_WEIGHTS", "8,3,1"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_worker_started = False
+_worker_lock = threading.Lock()
+_worker_threads: list[threading.Thread] = []
+
+_class_credit = {priority: 0 for priority in CLASS_WEIGHTS}
+_class_credit_lock = threading.Lock()
+
+
+def _lease_deadline():
+    return timezone.now() + timedelta(seconds=LEASE_SECONDS)
+
+
+def _release_topic(language: str, topic_name: str):
+    Topic.objects.filter(
+        name=topic_name,
+        language__name=language
+    ).update(is_processing=False)
+
+
+def requeue_expired_jobs():
+    """
+    Return jobs whose worker stopped renewing its lease to the queue
+    (or fail them after MAX_ATTEMPTS) and free their topic lock.
+    A job whose user has since queued another topic is failed instead,
+    since one_queued_job_per_user allows only one queued row per user.
+    Topic locks held without any running job are released as well.
+    """
+    now = timezone.now()
+    expired = PipelineJob.objects.filter(
+        status=PipelineJob.STATUS_RUNNING,
+        lease_expires_at__lt=now
+    )
+
+    for job in expired:
+        superseded = job.user_id is not None and PipelineJob.objects.filter(
+            user_id=job.user_id,
+            status=PipelineJob.STATUS_QUEUED
+        ).exists()
+        next_status = (
+            PipelineJob.STATUS_FAILED
+            if superseded or job.attempts >= MAX_ATTEMPTS
+            else PipelineJob.STATUS_QUEUED
+        )
+
+        # One savepoint per row: a row that cannot be requeued must never
+        # abort the caller's claim.
+        try:
+            with transaction.atomic():
+                reset = _reset_expired_job(job, now, next_status)
+        except IntegrityError:
+            # The user queued a new topic after the check above.
+            next_status = PipelineJob.STATUS_FAILED
+            with transaction.atomic():
+                reset = _reset_expired_job(job, now, next_status)
+
+        if reset:
+            _release_topic(job.language, job.topic_name)
+            logger.warning(
+                f"Lease expired for job {job.pk} ({job.topic_name}, worker={job.worker_id}) → {next_status}"
+                f"{' (superseded by a newer queued job)' if superseded else ''}"
+            )
+
+    _release_orphaned_topics()
+
+
+def _release_orphaned_topics():
+    """
+    Clear is_processing on topics no running job holds, e.g. locks left by
+    a crash outside a leased job or by the in-memory queue this table
+    replaced. claim_next_job would otherwise skip those topics forever.
+    """
+    running = PipelineJob.objects.filter(
+        status=PipelineJob.STATUS_RUNNING,
+        language=OuterRef("language__name"),
+        topic_name=OuterRef("name")
+    )
+    released = Topic.objects.filter(is_processing=True).exclude(Exists(running)).update(is_processing=False)
+    if released:
+        logger.warning(f"Released {released} topic lock(s) held by no running job")
+
+
+def _reset_expired_job(job, now, next_status: str) -> int:
+    return PipelineJob.objects.filter(
+        pk=job.pk,
+        status=PipelineJob.STATUS_RUNNING,
+        lease_expires_at__lt=now
+    ).update(
+        status=next_status,
+        worker_id="",
+        lease_expires_at=None,
+        finished_at=now if next_status == PipelineJob.STATUS_FAILED else None
+    )
+
+
+def _pick_class(available) -> int:
+    """Smooth weighted round-robin over the priority classes that have work."""
+    with _class_credit_lock:
+        total = 0
+        for priority in available:
+            _class_credit[priority] += CLASS_WEIGHTS[priority]
+            total += CLASS_WEIGHTS[priority]
+
+        chosen = max(available, key=lambda p: (_class_credit[p], -p))
+        _class_credit[chosen] -= total
+        return chosen
+
+
+def _schedule(candidates: list) -> list:
+    """
+    Order queued jobs for claiming:
+    - classes are interleaved by CLASS_WEIGHTS
+    - within a class, topics more users are waiting on go first
+    - then the user who was served least recently (round-robin across users)
+    - then FIFO
+    """
+    if not candidates:
+        return []
+
+    waiters = {
+        (row["language"], row["topic_name"]): row["users"]
+        for row in PipelineJob.objects.filter(
+            status=PipelineJob.STATUS_QUEUED
+        ).values("language", "topic_name").annotate(users=Count("user", distinct=True))
+    }
+
+    user_ids = {job.user_id for job in candidates if job.user_id is not None}
+    last_served = dict(
+        PipelineJob.objects.filter(
+            user_id__in=user_ids,
+            started_at__gte=timezone.now() - timedelta(seconds=STATS_WINDOW_SECONDS)
+        ).values("user_id").annotate(last=Max("started_at")).values_list("user_id", "last")
+    )
+    never = timezone.now() - timedelta(days=36500)
+
+    def key(job):
+        return (
+            -waiters.get((job.language, job.topic_name), 0),
+            last_served.get(job.user_id, never),
+            job.created_at,
+            job.id,
+        )
+
+    by_class = {}
+    for job in candidates:
+        by_class.setdefault(job.priority, []).append(job)
+
+    first = _pick_class(sorted(by_class))
+    ordered = sorted(by_class.pop(first), key=key)
+    for priority in sorted(by_class):
+        ordered.extend(sorted(by_class[priority], key=key))
+
+    return ordered
+
+
+def claim_next_job(worker_id: str = WORKER_ID):
+    """
+    Atomically claim the next scheduled job whose topic is not already
+    being processed. Topic.is_processing acts as the per-topic lock and
+    the conditional UPDATEs make the claim safe across processes.
+    """
+    requeue_expired_jobs()
+
+    candidates = []
+    for priority in CLASS_WEIGHTS:
+        candidates.extend(
+            PipelineJob.objects.filter(
+                status=PipelineJob.STATUS_QUEUED,
+                priority=priority
+            ).order_by("created_at", "id")[:CLAIM_SCAN_LIMIT]
+        )
+
+    for job in _schedule(candidates):
+        with transaction.atomic():
+            topic_locked = Topic.objects.filter(
+                name=job.topic_name,
+                language__name=job.language,
+                is_processing=False
+            ).update(is_processing=True)
+
+            if not topic_locked:
+                if not Topic.objects.filter(name=job.topic_name, language__name=job.language).exists():
+                    PipelineJob.objects.filter(pk=job.pk, status=PipelineJob.STATUS_QUEUED).update(
+                        status=PipelineJob.STATUS_FAILED,
+                        finished_at=timezone.now()
+                    )
+                    logger.error(f"Dropping job {job.pk}: topic {job.language}/{job.topic_name} does not exist")
+                continue
+
+            now = timezone.now()
+            claimed = PipelineJob.objects.filter(
+                pk=job.pk,
+                status=PipelineJob.STATUS_QUEUED
+            ).update(
+                status=PipelineJob.STATUS_RUNNING,
+                worker_id=worker_id,
+                lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                started_at=now,
+                attempts=F("attempts") + 1
+            )
+
+            if not claimed:
+                _release_topic(job.language, job.topic_name)
+                continue
+
+        job.refresh_from_db()
+        return job
+
+    return None
+
+
+def _renew_lease(job_id: int, worker_id: str, stop: threading.Event):
+    interval = max(LEASE_SECONDS / 3, 1)
+    try:
+        while not stop.wait(interval):
+            PipelineJob.objects.filter(
+                pk=job_id,
+                worker_id=worker_id,
+                status=PipelineJob.STATUS_RUNNING
+            ).update(lease_expires_at=_lease_deadline())
+    finally:
+        close_old_connections()
+
+
+def _finish_job(job, status: str):
+    PipelineJob.objects.filter(pk=job.pk, worker_id=job.worker_id).update(
+        status=status,
+        lease_expires_at=None,
+        finished_at=timezone.now()
+    )
+
+
+def run_job(job):
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_renew_lease,
+        args=(job.pk, job.worker_id, stop),
+        daemon=True
+    )
+    heartbeat.start()
+
+    try:
+        topic = Topic.objects.get(
+            name=job.topic_name,
+            language__name=job.language
+        )
+
+        if topic.is_fully_processed:
+            topic.is_processing = False
+            topic.save(update_fields=["is_processing"])
+            _finish_job(job, PipelineJob.STATUS_DONE)
+            return
+
+        async_to_sync(fetching_videos)(job.language, job.topic_name)
+
+        topic.is_fully_processed = True
+        topic.is_processing = False
+        topic.save(update_fields=["is_fully_processed", "is_processing"])
+        _finish_job(job, PipelineJob.STATUS_DONE)
+
+        logger.info(
+            f"Completed topic: {job.topic_name} (user={job.user_id})"
+        )
+
+    except Exception as e:
+        logger.exception(
+            f"Pipeline failed for user={job.user_id}, topic={job.topic_name}: {e}"
+        )
+        _release_topic(job.language, job.topic_name)
+        _finish_job(job, PipelineJob.STATUS_FAILED)
+
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def worker_loop(worker_id: str = WORKER_ID):
+    logger.info(f"Pipeline worker started ({worker_id})")
+
+    while True:
+        close_old_connections()
+
+        try:
+            job = claim_next_job(worker_id)
+        except Exception as e:
+            logger.exception(f"Failed to claim pipeline job: {e}")
+            job = None
+
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        run_job(job)
+
+
+def upsert_user_task(user_id: int, language: str, topic_name: str,
+                     priority: int = PipelineJob.PRIORITY_INTERACTIVE):
+    """
+    Rules:
+    - same user + same topic → no change
+    - same user + different topic → replace queued task
+    - running task is NOT touched
+
+    Each user owns at most one queued row (one_queued_job_per_user), so a
+    replace is a single indexed UPDATE that also moves the job to the back
+    of the queue, never a scan of the whole queue.
+    """
+    for _ in range(2):
+        with transaction.atomic():
+            queued = PipelineJob.objects.select_for_update().filter(
+                user_id=user_id,
+                status=PipelineJob.STATUS_QUEUED
+            ).first()
+
+            if queued is not None:
+                if queued.language == language and queued.topic_name == topic_name:
+                    return "unchanged"
+
+                queued.language = language
+                queued.topic_name = topic_name
+                queued.priority = priority
+                queued.created_at = timezone.now()
+                queued.save(update_fields=["language", "topic_name", "priority", "created_at"])
+                return "replaced"
+
+            try:
+                with transaction.atomic():
+                    PipelineJob.objects.create(
+                        user_id=user_id,
+                        language=language,
+                        topic_name=topic_name,
+                        priority=priority
+                    )
+                return "replaced"
+            except IntegrityError:
+                # Another request queued a job for this user first; retry as a replace.
+                continue
+
+    return "unchanged"
+
+
+def enqueue_topic(language: str, topic_name: str,
+                  priority: int = PipelineJob.PRIORITY_BACKFILL) -> str:
+    """
+    Queue a topic that no user is waiting on yet (speculative prefetch or
+    admin backfill). Skips topics that are done or already queued.
+    """
+    lang_obj, _ = Language.objects.get_or_create(name=language)
+    topic, _ = Topic.objects.get_or_create(language=lang_obj, name=topic_name)
+
+    if topic.is_fully_processed:
+        return "done"
+
+    if PipelineJob.objects.filter(
+        language=language,
+        topic_name=topic_name,
+        status__in=[PipelineJob.STATUS_QUEUED, PipelineJob.STATUS_RUNNING]
+    ).exists():
+        return "unchanged"
+
+    PipelineJob.objects.create(
+        language=language,
+        topic_name=topic_name,
+        priority=priority
+    )
+    return "queued"
+
+
+def prefetch_next_topic(language: str, topic_name: str):
+    """Speculatively queue the roadmap topic that follows `topic_name`."""
+    roadmap = Roadmap.objects.filter(language__name=language).first()
+    topics = roadmap.topics if roadmap and isinstance(roadmap.topics, list) else []
+
+    if topic_name not in topics:
+        return None
+
+    index = topics.index(topic_name)
+    if index + 1 >= len(topics):
+        return None
+
+    return enqueue_topic(language, topics[index + 1], PipelineJob.PRIORITY_PREFETCH)
+
+
+def remove_user_task(user_id: int) -> bool:
+    """Drop the user's queued job, if any. Running jobs are not touched."""
+    deleted, _ = PipelineJob.objects.filter(
+        user_id=user_id,
+        status=PipelineJob.STATUS_QUEUED
+    ).delete()
+    return bool(deleted)
+
+
+def start_worker_pool(size: int = POOL_SIZE, worker_id: str = WORKER_ID) -> list[threading.Thread]:
+    """
+    Start `size` worker threads draining the shared queue. Different topics
+    run in parallel; the Topic.is_processing lock taken in claim_next_job
+    keeps any single (language, topic) on one worker at a time.
+    """
+    threads = []
+    for i in range(max(size, 1)):
+        t = threading.Thread(
+            target=worker_loop,
+            args=(f"{worker_id}#{i}",),
+            name=f"pipeline-worker-{i}",
+            daemon=True
+        )
+        t.start()
+        threads.append(t)
+
+    logger.info(f"Started {len(threads)} pipeline workers ({worker_id})")
+    return threads
+
+
+def start_worker_once():
+    """
+    Start the in-process worker pool for this web process. Set
+    PIPELINE_INLINE_WORKER=0 when jobs are drained by dedicated
+    `manage.py run_pipeline_worker` processes instead.
+    """
+    global _worker_started
+
+    if os.getenv("PIPELINE_INLINE_WORKER", "1") == "0":
+        return
+
+    with _worker_lock:
+        if _worker_started:
+            return
+
+        _worker_threads.extend(start_worker_pool())
+        _worker_started = True
+
+
+def queue_stats() -> dict:
+    """Queue depth and wait times, for sizing PIPELINE_WORKERS."""
+    now = timezone.now()
+    since = now - timedelta(seconds=STATS_WINDOW_SECONDS)
+
+    queued = PipelineJob.objects.filter(status=PipelineJob.STATUS_QUEUED)
+    running = PipelineJob.objects.filter(status=PipelineJob.STATUS_RUNNING)
+
+    oldest = queued.order_by("created_at").values_list("created_at", flat=True).first()
+
+    waits = sorted(
+        (started - created).total_seconds()
+        for created, started in PipelineJob.objects.filter(
+            started_at__gte=since
+        ).values_list("created_at", "started_at")
+    )
+
+    return {
+        "queued": queued.count(),
+        "queued_by_priority": {
+            label.lower(): queued.filter(priority=priority).count()
+            for priority, label in PipelineJob.PRIORITY_CHOICES
+        },
+        "running": running.count(),
+        "busy_workers": running.values("worker_id").distinct().count(),
+        "local_workers": sum(t.is_alive() for t in _worker_threads),
+        "oldest_wait_seconds": (now - oldest).total_seconds() if oldest else 0,
+        "claimed_last_hour": len(waits),
+        "avg_wait_seconds": sum(waits) / len(waits) if waits else 0,
+        "p95_wait_seconds": waits[min(int(len(waits) * 0.95), len(waits) - 1)] if waits else 0,
+    }
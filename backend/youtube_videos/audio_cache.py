@@ -0,0 +1,244 @@
+# youtube_videos/audio_cache.py
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+from backend.youtube_videos.cookie_manager import AUDIO_EXT
+
+try:
+    import fcntl
+except ImportError:  # Windows: the ledger is then shared by threads only
+    fcntl = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = os.path.join(os.path.dirname(__file__), "audio_cache")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Entries used this recently are never evicted, so audio that is still being
+# split or transcribed cannot disappear underneath the pipeline.
+EVICTION_GRACE_SECONDS = 600
+
+LEDGER_NAME = ".ledger.json"
+
+
+class AudioCache:
+    """
+    Size-bounded LRU cache of downloaded audio, keyed by (video_id, variant)
+    in the AUDIO_EXT format. Each video has its own directory holding
+    "<variant><ext>" files and their split parts, so e.g. Stage 2 and the
+    full pipeline agree on where a video's audio lives and dropping a video
+    only touches its own files. Writes go through a temporary file and an
+    atomic rename.
+
+    Every worker process shares the directory. The total size lives in a
+    flock-guarded ledger file, file mtimes (bumped on every hit) are the
+    common LRU order, and only an eviction pass lists the whole directory;
+    it also reconciles the ledger with what is actually on disk.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ledger_path = os.path.join(directory, LEDGER_NAME)
+        self._lock = threading.Lock()
+        self._local_ledger: dict = {}
+
+        os.makedirs(directory, exist_ok=True)
+        with self._ledger():
+            pass
+
+    def _counted(self, ledger: dict) -> dict:
+        if "bytes" not in ledger:
+            # New or lost ledger: count what is already on disk.
+            ledger["bytes"] = sum(size for _, _, size in self._scan())
+        return ledger
+
+    @contextmanager
+    def _ledger(self):
+        with self._lock:
+            if fcntl is None:
+                yield self._counted(self._local_ledger)
+                return
+
+            with open(self.ledger_path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        ledger = json.loads(f.read() or "{}")
+                    except json.JSONDecodeError:
+                        ledger = {}
+
+                    yield self._counted(ledger)
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(ledger))
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _account(self, delta: int):
+        """Add `delta` bytes to the shared total and evict if it is over budget."""
+        with self._ledger() as ledger:
+            ledger["bytes"] = max(0, ledger["bytes"] + delta)
+            if ledger["bytes"] > self.max_bytes:
+                ledger["bytes"] = self._evict()
+
+    def video_dir(self, video_id: str) -> str:
+        return os.path.join(self.directory, video_id)
+
+    def path_for(self, video_id: str, variant: str = "full") -> str:
+        return os.path.join(self.video_dir(video_id), f"{variant}{AUDIO_EXT}")
+
+    def get(self, video_id: str, variant: str = "full") -> str | None:
+        """Return the cached file path (and mark it recently used), or None."""
+        path = self.path_for(video_id, variant)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def register(self, path: str, replaced_bytes: int = 0):
+        """Count a file written into a video's directory (e.g. split parts)."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        self._account(size - replaced_bytes)
+
+    def fill(self, video_id: str, variant: str, producer: Callable[[str], bool]) -> str | None:
+        """
+        Run `producer(tmp_path)` and, if it reports success, atomically move
+        its output into the cache. Returns the cached path or None.
+        """
+        final_path = self.path_for(video_id, variant)
+        os.makedirs(self.video_dir(video_id), exist_ok=True)
+        tmp_path = os.path.join(self.video_dir(video_id), f".{variant}.{uuid.uuid4().hex}{AUDIO_EXT}")
+
+        try:
+            if producer(tmp_path) and os.path.exists(tmp_path):
+                replaced = os.path.getsize(final_path) if os.path.exists(final_path) else 0
+                os.replace(tmp_path, final_path)
+                self.register(final_path, replaced)
+                return final_path
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def discard(self, video_id: str, variant: str | None = None):
+        """Delete one variant, or every file, cached for `video_id`."""
+        freed = 0
+
+        if variant:
+            path = self.path_for(video_id, variant)
+            try:
+                freed = os.path.getsize(path)
+                os.remove(path)
+                logger.info(f"Deleted cached audio: {path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error deleting file {path}: {e}")
+        else:
+            directory = self.video_dir(video_id)
+            try:
+                with os.scandir(directory) as entries:
+                    freed = sum(e.stat().st_size for e in entries if e.is_file())
+                shutil.rmtree(directory)
+                logger.info(f"Deleted cached audio: {directory}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error deleting {directory}: {e}")
+
+        if freed:
+            self._account(-freed)
+
+    def _scan(self) -> list[tuple[float, str, int]]:
+        """(mtime, path, size) of every cached file, temporary files excluded."""
+        files = []
+        for video in os.scandir(self.directory):
+            if not video.is_dir():
+                continue
+            try:
+                with os.scandir(video.path) as entries:
+                    for entry in entries:
+                        if entry.is_file() and not entry.name.startswith("."):
+                            stat = entry.stat()
+                            files.append((stat.st_mtime, entry.path, stat.st_size))
+            except FileNotFoundError:
+                continue
+        return files
+
+    def _evict(self) -> int:
+        """
+        Drop least recently used files, across all processes, until under
+        the byte budget. Caller holds the ledger. Returns the bytes left on disk.
+        """
+        files = sorted(self._scan())
+        total = sum(size for _, _, size in files)
+        cutoff = time.time() - EVICTION_GRACE_SECONDS
+
+        for mtime, path, size in files:
+            if total <= self.max_bytes:
+                break
+            if mtime > cutoff:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Could not evict {path}: {e}")
+                continue
+
+            total -= size
+            logger.info(f"Evicted cached audio: {path}")
+
+        self._remove_leftovers(cutoff)
+        return total
+
+    def _remove_leftovers(self, cutoff: float):
+        """
+        Remove old files nothing counts: temporary files of crashed writers,
+        empty video directories and audio from the old flat layout.
+        """
+        for video in os.scandir(self.directory):
+            if not video.is_dir():
+                if video.name != LEDGER_NAME and video.stat().st_mtime < cutoff:
+                    os.remove(video.path)
+                continue
+            try:
+                with os.scandir(video.path) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(".") and entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                if video.stat().st_mtime < cutoff:
+                    os.rmdir(video.path)
+            except OSError:
+                # Not empty, or another process is using it.
+                continue
+
+    def clear(self):
+        with self._ledger() as ledger:
+            for entry in os.scandir(self.directory):
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            ledger["bytes"] = 0
+
+    def size_bytes(self) -> int:
+        with self._ledger() as ledger:
+            return ledger["bytes"]
+
+
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES)
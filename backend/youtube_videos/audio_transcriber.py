@@ -1,7 +1,14 @@
 # youtube_videos/audio_transcriber.py
 
 import os
-import whisper
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+from backend.youtube_videos.resource_limits import transcribe_slots
+from backend.youtube_videos.voice_activity import strip_silence
 
 import logging
 logger = logging.getLogger(__name__)
@@ -9,35 +16,259 @@ logger = logging.getLogger(__name__)
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+VAD_ENABLED = os.getenv("WHISPER_VAD", "1") != "0"
+
+# Batched clip transcription: 30 s windows decoded per forward pass, and how
+# long the clip batcher waits for other clips to join a batch.
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+CLIP_BATCH_MAX_CLIPS = int(os.getenv("WHISPER_CLIP_BATCH_MAX_CLIPS", "4"))
+CLIP_BATCH_WAIT_SECONDS = float(os.getenv("WHISPER_CLIP_BATCH_WAIT", "0.5"))
+
+# Whisper timestamp tokens are 20 ms apart.
+SAMPLES_PER_TIMESTAMP = 320
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_whisper_model():
+    """
+    Load the Whisper model on first use, at most once per process.
+    Web processes that never transcribe never import whisper or hold its weights.
+    """
+    global _model
+
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import whisper
+
+                logger.info(f"Loading Whisper model '{WHISPER_MODEL}'...")
+                _model = whisper.load_model(WHISPER_MODEL)
+
+    return _model
+
+
 class WhisperTranscriber:
-    model = whisper.load_model("base")
-    """Handles audio transcription using Groq API with rate limiting and error handling"""
-    
+    """
+    Handles audio transcription with the process-wide local Whisper model.
+    Runs hold a transcribe_slots slot unless `use_slots` is False, as in the
+    Whisper pool processes, which are capped by the pool size instead.
+    """
+
+    def __init__(self, use_slots: bool = True):
+        self._slots = transcribe_slots if use_slots else nullcontext()
+
+    @property
+    def model(self):
+        return get_whisper_model()
+
     def transcribe_audio(self, audio_path: str) -> str:
         """Handle transcription with proper response parsing"""
+        result = self.transcribe_with_segments(audio_path)
+        return result["text"] if result else None
+
+    def transcribe_with_segments(self, audio_path: str) -> dict:
+        """
+        Transcribe only the voiced parts of the audio (see voice_activity).
+        Returns Whisper's result with segment timestamps mapped back onto the
+        original audio, or None on failure.
+        """
         if not audio_path or not os.path.exists(audio_path):
             logger.error(f"Audio file not found")
             return None
         
         try:
             import time
+            from whisper.audio import load_audio
 
             start_time = time.time()
             print(f"Transcribing: {audio_path}")
 
-            result = self.model.transcribe(audio_path, task="translate", language = "en")
+            audio = load_audio(audio_path)
+            if VAD_ENABLED:
+                audio, timeline = strip_silence(audio)
+            else:
+                timeline = None
+
+            if len(audio) == 0:
+                logger.info(f"No speech detected: {audio_path}")
+                return {"text": "", "segments": []}
+
+            with self._slots:
+                result = self.model.transcribe(audio, task="translate", language = "en")
+
+            if timeline is not None:
+                for segment in result.get("segments", []):
+                    segment["start"] = timeline.to_original(segment["start"])
+                    segment["end"] = timeline.to_original(segment["end"])
+
             end_time = time.time()
             duration = end_time - start_time
 
             logger.info(f"Finished: {audio_path}")
             logger.info(f"Time taken: {duration:.2f} seconds")
 
-            return result["text"]
+            return result
         
         except Exception as e:
             logger.warning(f"Local transcription error: {str(e)[:200]}")
             return None
         
-def transcribe_audio_with_whisper(audio_path: str) -> str:
-    transcriber = WhisperTranscriber()
+    def transcribe_batch(self, audio_paths: list[str]) -> list[str | None]:
+        """
+        Transcribe several short clips together. Each round decodes the next
+        30 s window of every unfinished clip as one padded mel batch, so a
+        forward pass serves many clips. Like Whisper's own transcribe(), a
+        window that ends inside a sentence is cut at its last complete
+        segment and the next window starts there, so no words are lost on
+        window edges and the text can be kept as a transcript. Returns one
+        text per clip, None where the clip could not be read.
+        """
+        import torch
+        import whisper
+        from whisper.audio import N_SAMPLES, load_audio, log_mel_spectrogram, pad_or_trim
+        from whisper.tokenizer import get_tokenizer
+
+        start_time = time.time()
+        audios: list = [None] * len(audio_paths)
+        texts: list[list[str] | None] = [None] * len(audio_paths)
+
+        for index, audio_path in enumerate(audio_paths):
+            try:
+                audio = load_audio(audio_path)
+            except Exception as e:
+                logger.warning(f"Could not load {audio_path}: {str(e)[:200]}")
+                continue
+
+            if VAD_ENABLED:
+                audio, _ = strip_silence(audio)
+
+            audios[index] = audio
+            texts[index] = []
+
+        model = self.model
+        tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language="en", task="translate"
+        )
+        options = whisper.DecodingOptions(
+            task="translate", language="en", fp16=model.device.type == "cuda",
+        )
+        seeks = [0] * len(audio_paths)
+        windows = 0
+
+        while True:
+            active = [i for i, audio in enumerate(audios) if audio is not None and seeks[i] < len(audio)]
+            if not active:
+                break
+
+            for batch_start in range(0, len(active), max(1, WHISPER_BATCH_SIZE)):
+                batch = active[batch_start:batch_start + max(1, WHISPER_BATCH_SIZE)]
+                mel = torch.stack([
+                    log_mel_spectrogram(pad_or_trim(audios[i][seeks[i]:seeks[i] + N_SAMPLES]), model.dims.n_mels)
+                    for i in batch
+                ]).to(model.device)
+
+                with self._slots:
+                    results = whisper.decode(model, mel, options)
+
+                for index, result in zip(batch, results):
+                    window = min(N_SAMPLES, len(audios[index]) - seeks[index])
+                    tokens, advance = _seek_window(result.tokens, tokenizer.timestamp_begin, window)
+                    seeks[index] += advance
+                    windows += 1
+
+                    # Same silence rule Whisper's own transcribe() applies per window.
+                    if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                        continue
+                    texts[index].append(tokenizer.decode(tokens).strip())
+
+        logger.info(
+            f"Batch transcribed {len(audio_paths)} clips ({windows} windows) "
+            f"in {time.time() - start_time:.2f} seconds"
+        )
+        return [" ".join(t for t in parts if t).strip() if parts is not None else None for parts in texts]
+
+
+def _seek_window(tokens: list[int], timestamp_begin: int, window_samples: int) -> tuple[list[int], int]:
+    """
+    Split one decoded window the way Whisper's transcribe() does. Returns
+    the tokens to keep and how many samples to advance: up to the last
+    complete segment when the window ends mid-segment, else the whole window.
+    """
+    is_timestamp = [t >= timestamp_begin for t in tokens]
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    segment_ends = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+
+    if segment_ends and not single_timestamp_ending:
+        last = segment_ends[-1]
+        advance = (tokens[last - 1] - timestamp_begin) * SAMPLES_PER_TIMESTAMP
+        if 0 < advance < window_samples:
+            return tokens[:last], advance
+
+    return tokens, window_samples
+
+
+class ClipBatcher:
+    """
+    Collects clips submitted from concurrent threads (e.g. the Stage 2
+    filter workers) for up to CLIP_BATCH_WAIT_SECONDS and transcribes them
+    together with WhisperTranscriber.transcribe_batch.
+    """
+
+    def __init__(self, max_clips: int = CLIP_BATCH_MAX_CLIPS, wait_seconds: float = CLIP_BATCH_WAIT_SECONDS):
+        self.max_clips = max(1, max_clips)
+        self.wait_seconds = wait_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio_path: str) -> str | None:
+        """Block until the batch containing `audio_path` has been transcribed."""
+        future = Future()
+        self._queue.put((audio_path, future))
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="whisper-clip-batcher", daemon=True)
+                self._thread.start()
+
+        return future.result()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait_seconds
+
+        while len(batch) < self.max_clips:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        transcriber = WhisperTranscriber()
+
+        while True:
+            batch = self._next_batch()
+            try:
+                texts = transcriber.transcribe_batch([path for path, _ in batch])
+            except Exception as e:
+                logger.warning(f"Batch transcription error: {str(e)[:200]}")
+                texts = [None] * len(batch)
+
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+
+clip_batcher = ClipBatcher()
+
+
+def transcribe_audio_with_whisper(audio_path: str, use_slots: bool = True) -> str:
+    transcriber = WhisperTranscriber(use_slots)
     return transcriber.transcribe_audio(audio_path)
\ No newline at end of file
@@ -0,0 +1,109 @@
+# youtube_videos/caption_client.py
+
+import asyncio
+import html
+import os
+import xml.etree.ElementTree as ET
+
+import httpx
+from youtube_transcript_api import (
+    NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, YouTubeTranscriptApi,
+)
+
+from backend.youtube_videos.http_client import aget
+
+import logging
+logger = logging.getLogger(__name__)
+
+TIMEDTEXT_URL = "https://www.youtube.com/api/timedtext"
+
+# Preferred caption languages, best first. All of them are requested at once
+# and the best one that exists wins, so a missing track costs no extra round trip.
+CAPTION_LANGUAGES = [
+    lang.strip() for lang in os.getenv("CAPTION_LANGUAGES", "en,en-US,en-GB").split(",") if lang.strip()
+]
+CAPTION_TIMEOUT = float(os.getenv("CAPTION_TIMEOUT", "10"))
+
+
+class CaptionFetchError(Exception):
+    """Raised when it could not be determined whether a video has captions."""
+
+
+def _parse_timedtext(body: str) -> list[dict]:
+    """Parse timedtext XML into youtube-transcript-api style segments."""
+    root = ET.fromstring(body)
+    segments = []
+    for node in root.iter("text"):
+        if not node.text:
+            continue
+        segments.append({
+            "text": html.unescape(node.text).replace("\n", " ").strip(),
+            "start": float(node.get("start", 0)),
+            "duration": float(node.get("dur", 0)),
+        })
+    return segments
+
+
+async def _fetch_timedtext(video_id: str, lang: str, kind: str | None = None) -> list[dict] | None:
+    params = {"v": video_id, "lang": lang}
+    if kind:
+        params["kind"] = kind
+
+    try:
+        response = await aget(TIMEDTEXT_URL, params=params, timeout=CAPTION_TIMEOUT)
+        if response.status_code != 200 or not response.text.strip():
+            return None
+        return _parse_timedtext(response.text) or None
+    except (httpx.HTTPError, ET.ParseError) as e:
+        logger.debug(f"Timedtext {lang}/{kind} failed for {video_id}: {e}")
+        return None
+
+
+def _fetch_with_library(video_id: str, languages: list[str]) -> list[dict] | None:
+    """
+    youtube-transcript-api finds tracks the plain timedtext endpoint does not
+    list, and tells a video without captions apart from a failed request.
+    """
+    try:
+        return YouTubeTranscriptApi().fetch(video_id, languages=languages).to_raw_data() or None
+    except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable):
+        return None
+    except Exception as e:
+        raise CaptionFetchError(f"youtube-transcript-api failed for {video_id}: {e}") from e
+
+
+async def fetch_captions(video_id: str, languages: list[str] | None = None) -> list[dict] | None:
+    """
+    Return caption segments ({"text", "start", "duration"}) for a video, or
+    None if it has none. Manual tracks in every preferred language and the
+    auto-generated track are requested concurrently; the first preference
+    that exists is returned and the remaining requests are cancelled.
+
+    Raises CaptionFetchError when the lookup failed, so callers do not
+    mistake an outage for a missing track.
+    """
+    languages = languages or CAPTION_LANGUAGES
+    attempts = [(lang, None) for lang in languages] + [(languages[0], "asr")]
+
+    tasks = [asyncio.create_task(_fetch_timedtext(video_id, lang, kind)) for lang, kind in attempts]
+    try:
+        for (lang, kind), task in zip(attempts, tasks):
+            segments = await task
+            if segments:
+                logger.info(f"Fetched {lang}{'/' + kind if kind else ''} captions for {video_id}")
+                return segments
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    segments = await asyncio.to_thread(_fetch_with_library, video_id, languages)
+    if segments:
+        logger.info(f"Fetched captions for {video_id} via youtube-transcript-api")
+        return segments
+
+    logger.info(f"No captions available for {video_id}")
+    return None
+
+
+def captions_to_text(segments: list[dict]) -> str:
+    return " ".join(s["text"] for s in segments if s.get("text")).strip()
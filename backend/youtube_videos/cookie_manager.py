@@ -1,12 +1,24 @@
 # backend/youtube_videos/cookie_manager.py
 
+import glob
 import os
+import ffmpeg
 import yt_dlp
+from yt_dlp.utils import download_range_func
 import logging
 import sys
+import threading
+from typing import Callable
+
+from backend.youtube_videos.resource_limits import download_slots
 
 logger = logging.getLogger(__name__)
 
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "whisper")
+AUDIO_EXT = ".opus" if AUDIO_PROFILE == "whisper" else ".mp3"
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_BITRATE = "24k"
+
 _last_progress = ""
 
 
@@ -31,19 +43,77 @@ def progress_hook(d):
         logger.info(f"Download finished: {d.get('filename')}")
 
 
-def download_with_cookie(url: str, cookie_file: str | None, output_path: str) -> bool:
+def _to_whisper_audio(source_path: str, output_path: str) -> bool:
+    """Convert any downloaded stream straight to 16 kHz mono Opus, the rate Whisper decodes at."""
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.tmp{ext}"
+
+    try:
+        (
+            ffmpeg
+            .input(source_path)
+            .output(tmp_path, vn=None, ac=1, ar=WHISPER_SAMPLE_RATE, acodec="libopus",
+                    **{"b:a": WHISPER_BITRATE, "threads": 1})
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.replace(tmp_path, output_path)
+        return True
+    except Exception as e:
+        logger.warning(f"Whisper audio conversion failed: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+
+def _downloaded_source(output_template: str) -> str | None:
+    matches = [p for p in glob.glob(glob.escape(output_template) + ".src.*") if not p.endswith(".part")]
+    return matches[0] if matches else None
+
+
+def _remove_sources(output_template: str):
+    """Delete raw streams and .part files a failed or cancelled attempt left behind."""
+    for path in glob.glob(glob.escape(output_template) + ".src.*"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+
+
+def download_with_cookie(url: str, cookie_file: str | None, output_path: str,
+                         section: tuple[float, float] | None = None,
+                         cancel: threading.Event | None = None,
+                         profile: str | None = None) -> bool:
     """
-    Download audio as MP3.
+    Download audio to `output_path`.
     Cookies are intentionally ignored.
     Strategy:
     1) Audio-only
     2) Muxed fallback
+
+    Profiles:
+    - "whisper" (default): smallest available stream, converted once to
+      16 kHz mono Opus (AUDIO_EXT is ".opus")
+    - "mp3": 192 kbps MP3 re-encode, the original behaviour
+
+    `section=(start, end)` fetches only that time range of the stream
+    (end may be float("inf")) instead of the whole video. Setting `cancel`
+    skips the remaining attempts, and aborts a whole-stream download at its
+    next progress update. Section downloads run through yt-dlp's ffmpeg
+    downloader, which reports no progress until it is done, so an attempt
+    already fetching a section always runs to completion.
     """
+    profile = profile or AUDIO_PROFILE
 
     if os.path.exists(output_path):
         os.remove(output_path)
 
-    output_template = output_path.replace(".mp3", "")
+    output_template = os.path.splitext(output_path)[0]
 
     base_opts = {
         "ignoreconfig": True,
@@ -78,38 +148,88 @@ def download_with_cookie(url: str, cookie_file: str | None, output_path: str) ->
         }],
     }
 
+    if profile == "whisper":
+        # Keep the raw stream; _to_whisper_audio does the only re-encode.
+        base_opts["outtmpl"] = output_template + ".src.%(ext)s"
+        base_opts["postprocessors"] = []
+
+    if cancel is not None:
+        def cancel_hook(d):
+            # Only mid-download: a "finished" update means the file is complete.
+            if d["status"] == "downloading" and cancel.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled")
+
+        base_opts["progress_hooks"] = [cancel_hook, progress_hook]
+
+    if section is not None:
+        base_opts["download_ranges"] = download_range_func(None, [section])
+        logger.info(f"Downloading section {section[0]}s-{section[1]}s only")
+
+    def finished() -> bool:
+        if profile == "whisper":
+            source = _downloaded_source(output_template)
+            return bool(source) and _to_whisper_audio(source, output_path)
+        return os.path.exists(output_template + ".mp3")
+
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    try:
+        return _download_attempts(url, base_opts, profile, finished, cancelled)
+    finally:
+        # Raw "<template>.src.*" files start with a dot inside the audio
+        # cache, which neither counts nor evicts them.
+        _remove_sources(output_template)
+
+
+def _download_attempts(url: str, base_opts: dict, profile: str,
+                       finished: Callable[[], bool], cancelled: Callable[[], bool]) -> bool:
     # ---------- Attempt 1: audio-only ----------
+    if cancelled():
+        return False
+
     try:
         logger.info("Trying audio-only download...")
         ydl_opts = dict(base_opts)
+        ydl_opts["format"] = "worstaudio/bestaudio" if profile == "whisper" else "bestaudio/best"
 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
 
-        if os.path.exists(output_template + ".mp3"):
+        if finished():
             return True
 
     except Exception as e:
         logger.warning(f"Audio-only failed: {e}")
 
+    if cancelled():
+        return False
+
     # ---------- Attempt 2: muxed fallback ----------
     try:
         logger.info("Falling back to muxed download...")
         ydl_opts = dict(base_opts)  # no format forcing
+        if profile == "whisper":
+            ydl_opts["format"] = "worst"
 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
 
-        return os.path.exists(output_template + ".mp3")
+        return finished()
 
     except Exception as e:
         logger.warning(f"Muxed fallback failed: {e}")
         return False
 
 
-def rotate_cookies_and_download(url: str, output_path: str, cookie_dir: str) -> bool:
+def rotate_cookies_and_download(url: str, output_path: str, cookie_dir: str,
+                                section: tuple[float, float] | None = None,
+                                cancel: threading.Event | None = None) -> bool:
     """
     Cookies are deprecated and intentionally disabled.
     Function kept for pipeline compatibility.
     """
-    return download_with_cookie(url, None, output_path)
+    with download_slots:
+        if cancel is not None and cancel.is_set():
+            return False
+        return download_with_cookie(url, None, output_path, section, cancel)
@@ -1,7 +1,6 @@
 # youtube_videos/groq_transcript_analysis.py
 
-import os
-from groq import Groq
+from backend import llm_gateway
 import logging
 logger = logging.getLogger(__name__)
 
@@ -13,13 +12,10 @@ def analyze_with_groq(transcript: str, language: str, topic: str, title: str, de
     Returns True if either check confirms relevance.
     """
     try:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
+        if not llm_gateway.is_configured():
             logger.error("Groq API key not found in environment variables.")
             return False
 
-        client = Groq(api_key=api_key)
-
         transcript_prompt = f"""
         Analyze this programming video transcript and determine if it explicitly discusses BOTH:
         1. Programming Language: {language}
@@ -36,14 +32,12 @@ def analyze_with_groq(transcript: str, language: str, topic: str, title: str, de
         Respond with exactly "true" if both are properly covered, otherwise "false".
         """
 
-        transcript_response = client.chat.completions.create(
+        transcript_result = llm_gateway.chat(
+            [{"role": "user", "content": transcript_prompt}],
             model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": transcript_prompt}],
             temperature=0,
             max_tokens=10,
-        )
-
-        transcript_result = transcript_response.choices[0].message.content.strip().lower()
+        ).strip().lower()
 
         if "true" in transcript_result:
             logger.info(f"Groq: Transcript confirms {language} + {topic} → {title}")
@@ -70,14 +64,12 @@ def analyze_with_groq(transcript: str, language: str, topic: str, title: str, de
         Respond with exactly "true" if relevant, otherwise "false".
         """
 
-        metadata_response = client.chat.completions.create(
+        metadata_result = llm_gateway.chat(
+            [{"role": "user", "content": metadata_prompt}],
             model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": metadata_prompt}],
             temperature=0,
             max_tokens=10,
-        )
-
-        metadata_result = metadata_response.choices[0].message.content.strip().lower()
+        ).strip().lower()
 
         if "true" in metadata_result:
             logger.info(f"Groq: Metadata confirms {language} + {topic} → {title}")
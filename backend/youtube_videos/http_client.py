@@ -0,0 +1,164 @@
+# youtube_videos/http_client.py
+
+import asyncio
+import atexit
+import importlib.util
+import os
+import random
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Shared HTTP clients for the YouTube Data API and caption endpoints, so
+# every request reuses pooled keep-alive connections and none can hang a
+# pipeline worker forever.
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_session = None
+_session_lock = threading.Lock()
+
+# httpx async clients are bound to the loop they were first used on, while
+# pipeline jobs and async_to_sync calls each run a short-lived loop of their
+# own. One long-lived loop thread owns the only AsyncClient instead, and is
+# closed at exit.
+_io_loop: asyncio.AbstractEventLoop | None = None
+_io_client: httpx.AsyncClient | None = None
+_io_pid = None
+_io_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide requests session with pooled connections and retries with jittered backoff."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_BACKOFF,
+                backoff_jitter=HTTP_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_MAX_CONNECTIONS,
+                pool_maxsize=HTTP_MAX_CONNECTIONS,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get(url: str, params: dict | None = None, timeout: float | None = None) -> requests.Response:
+    return get_session().get(
+        url, params=params, timeout=(HTTP_CONNECT_TIMEOUT, timeout or HTTP_TIMEOUT)
+    )
+
+
+def _start_io_loop():
+    """Start the loop thread that owns the process's AsyncClient. Caller holds _io_lock."""
+    global _io_loop, _io_client, _io_pid
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="http-io-loop", daemon=True).start()
+
+    _io_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS // 2,
+        ),
+        follow_redirects=True,
+    )
+    _io_loop = loop
+    _io_pid = os.getpid()
+
+
+def get_io_loop() -> asyncio.AbstractEventLoop:
+    """The long-lived event loop every async HTTP request runs on."""
+    with _io_lock:
+        # A forked worker inherits the variables but not the loop thread.
+        if _io_loop is None or _io_pid != os.getpid():
+            _start_io_loop()
+        return _io_loop
+
+
+def close_io_loop(timeout: float = 5):
+    """Close the shared AsyncClient and stop its loop; the next request starts new ones."""
+    global _io_loop, _io_client
+
+    with _io_lock:
+        loop, client = _io_loop, _io_client
+        _io_loop = _io_client = None
+
+    if loop is None or _io_pid != os.getpid():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Could not close the async HTTP client: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(close_io_loop)
+
+
+def _retry_delay(attempt: int, retry_after: str | None = None) -> float:
+    """Honour Retry-After when given, else exponential backoff with full jitter."""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, HTTP_BACKOFF * (2 ** attempt))
+
+
+async def aget(url: str, params: dict | None = None, timeout: float | None = None) -> httpx.Response:
+    """
+    GET on the process-wide pooled client, retrying transport errors and
+    RETRY_STATUSES. Callers on any other loop (pipeline jobs, async_to_sync
+    calls, ASGI requests) hand the request to the I/O loop, so they share
+    its connections and never open a client of their own.
+    """
+    loop = get_io_loop()
+    if asyncio.get_running_loop() is loop:
+        return await _aget(url, params, timeout)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_aget(url, params, timeout), loop))
+
+
+async def _aget(url: str, params: dict | None, timeout: float | None) -> httpx.Response:
+    client = _io_client
+
+    for attempt in range(HTTP_RETRIES + 1):
+        try:
+            response = await client.get(url, params=params, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+            if response.status_code not in RETRY_STATUSES or attempt == HTTP_RETRIES:
+                return response
+            delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"HTTP {response.status_code} from {url}, retrying in {delay:.1f}s")
+        except httpx.TransportError as e:
+            if attempt == HTTP_RETRIES:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning(f"HTTP error from {url} ({e}), retrying in {delay:.1f}s")
+
+        await asyncio.sleep(delay)
@@ -0,0 +1,65 @@
+# youtube_videos/quota.py
+
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+
+from main_app.models import ApiQuotaUsage
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Running ledger of YouTube Data API quota units, shared by every process
+# through the database. Google resets the daily quota at midnight Pacific.
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+QUOTA_WARN_RATIO = 0.9
+QUOTA_COSTS = {
+    "search": 100,
+    "videos": 1,
+}
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+def _quota_day():
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+
+def record_quota(endpoint: str):
+    """Add one call to `endpoint` to today's ledger row."""
+    units = QUOTA_COSTS[endpoint]
+    day = _quota_day()
+
+    try:
+        for _ in range(2):
+            if ApiQuotaUsage.objects.filter(day=day).update(units=F("units") + units, requests=F("requests") + 1):
+                break
+            try:
+                with transaction.atomic():
+                    ApiQuotaUsage.objects.create(day=day, units=units, requests=1)
+                break
+            except IntegrityError:
+                # Another process created today's row first; retry as an update.
+                continue
+
+        used = quota_used_today()
+        if used >= YOUTUBE_DAILY_QUOTA * QUOTA_WARN_RATIO:
+            logger.warning(f"YouTube API quota at {used}/{YOUTUBE_DAILY_QUOTA} units for {day}")
+    except DatabaseError as e:
+        logger.warning(f"Could not record YouTube quota usage: {e}")
+
+
+def quota_used_today() -> int:
+    return ApiQuotaUsage.objects.filter(day=_quota_day()).values_list("units", flat=True).first() or 0
+
+
+def quota_stats() -> dict:
+    usage = ApiQuotaUsage.objects.filter(day=_quota_day()).first()
+    return {
+        "day": str(_quota_day()),
+        "units": usage.units if usage else 0,
+        "requests": usage.requests if usage else 0,
+        "daily_limit": YOUTUBE_DAILY_QUOTA,
+    }
@@ -0,0 +1,15 @@
+# youtube_videos/resource_limits.py
+
+import os
+import threading
+
+# Process-wide caps shared by every pipeline worker thread and event loop,
+# so concurrent videos cannot oversubscribe the network, CPU or LLM quota.
+# Hold them around blocking calls only, never from the event loop thread.
+DOWNLOAD_CONCURRENCY = int(os.getenv("PIPELINE_DOWNLOAD_CONCURRENCY", "3"))
+TRANSCRIBE_CONCURRENCY = int(os.getenv("PIPELINE_TRANSCRIBE_CONCURRENCY", "1"))
+LLM_CONCURRENCY = int(os.getenv("PIPELINE_LLM_CONCURRENCY", "2"))
+
+download_slots = threading.BoundedSemaphore(DOWNLOAD_CONCURRENCY)
+transcribe_slots = threading.BoundedSemaphore(TRANSCRIBE_CONCURRENCY)
+llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
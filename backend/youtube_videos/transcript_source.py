@@ -0,0 +1,62 @@
+# youtube_videos/transcript_source.py
+
+import os
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+
+from backend.youtube_videos.caption_client import CaptionFetchError, captions_to_text, fetch_captions
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Every stage asks here for captions before touching audio. Results are kept
+# in the shared pipeline cache: hits for a week, confirmed misses for a few
+# hours so a track published later is still picked up. Failed lookups are
+# not cached.
+CAPTION_CACHE_TTL = int(os.getenv("CAPTION_CACHE_TTL", str(7 * 24 * 3600)))
+CAPTION_NEGATIVE_TTL = int(os.getenv("CAPTION_NEGATIVE_TTL", str(6 * 3600)))
+
+pipeline_cache = caches["pipeline"]
+
+
+def _cache_key(video_id: str) -> str:
+    return f"captions:{video_id}"
+
+
+async def get_captions(video_id: str) -> list[dict] | None:
+    """Caption segments for a video, or None when it has none or the lookup failed."""
+    key = _cache_key(video_id)
+
+    cached = await pipeline_cache.aget(key)
+    if cached is not None:
+        logger.info(f"Caption cache {'hit' if cached else 'negative hit'} for {video_id}")
+        return cached or None
+
+    try:
+        segments = await fetch_captions(video_id)
+    except CaptionFetchError as e:
+        logger.warning(f"Caption lookup failed, not caching: {e}")
+        return None
+
+    await pipeline_cache.aset(
+        key,
+        segments or [],
+        CAPTION_CACHE_TTL if segments else CAPTION_NEGATIVE_TTL
+    )
+    return segments
+
+
+def get_captions_sync(video_id: str) -> list[dict] | None:
+    """get_captions for synchronous callers such as the Stage 2 filter threads."""
+    return async_to_sync(get_captions)(video_id)
+
+
+async def get_caption_text(video_id: str) -> str | None:
+    segments = await get_captions(video_id)
+    return captions_to_text(segments) if segments else None
+
+
+def caption_text_until(segments: list[dict], seconds: float) -> str:
+    """Text of the captions that start within the first `seconds` of the video."""
+    return captions_to_text([s for s in segments if s.get("start", 0) < seconds])
@@ -1,56 +1,53 @@
 # youtube_videos/transcript_utils.py
 
 import asyncio
+import math
 from concurrent.futures import ThreadPoolExecutor
-import shutil
+from backend.youtube_videos.audio_cache import audio_cache
 from backend.youtube_videos.cookie_manager import rotate_cookies_and_download
-from pydub import AudioSegment
+import ffmpeg
 import os
 import yt_dlp
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_videos.audio_transcriber import transcribe_audio_with_whisper
+from backend.youtube_videos.transcript_source import get_caption_text
+from backend.youtube_videos.transcription_service import WHISPER_SEGMENTS, transcribe_segments
 import logging
 
 from asgiref.sync import sync_to_async
-from main_app.models import Transcript, Video
+from main_app.models import PartialTranscript, Transcript, Video
 
 logger = logging.getLogger(__name__)
 
-AUDIO_CACHE_DIR = os.path.join(os.path.dirname(__file__), "audio_cache")
-os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
+def download_to_cache(video_url: str, video_id: str, variant: str = "full",
+                      section: tuple[float, float] | None = None, cancel=None) -> str | None:
+    """Download audio into the shared audio cache and return its path."""
+    cookie_dir = os.getenv("YTDLP_COOKIES_DIR", "cookies")
+    return audio_cache.fill(
+        video_id,
+        variant,
+        lambda tmp_path: rotate_cookies_and_download(video_url, tmp_path, cookie_dir, section, cancel)
+    )
+
+
 async def download_audio(video_url: str, video_id) -> list:
     """Download and split audio using cookie rotation."""
     loop = asyncio.get_event_loop()
-    output_path = os.path.join(AUDIO_CACHE_DIR, f"{video_id}.mp3")
-    cookie_dir = os.getenv("YTDLP_COOKIES_DIR", "cookies")
 
-    if os.path.exists(output_path):
-        os.remove(output_path)
+    audio_cache.discard(video_id)
 
     logger.info(f"Downloading audio for {video_id} with cookie rotation...")
 
     for attempt in range(MAX_RETRIES):
         try:
-            success = await loop.run_in_executor(
-                None,
-                rotate_cookies_and_download,
-                video_url,
-                output_path,
-                cookie_dir
-            )
+            output_path = await loop.run_in_executor(None, download_to_cache, video_url, video_id)
 
-            if not success:
+            if not output_path:
                 logger.warning(f"Attempt {attempt+1}: Cookie rotation failed.")
                 await asyncio.sleep(RETRY_DELAY * (attempt + 1))
                 continue
 
-            if not os.path.exists(output_path):
-                logger.error(f"Download success reported but file missing: {output_path}")
-                return []
-
             with ThreadPoolExecutor() as executor:
                 return await loop.run_in_executor(executor, split_audio_file, output_path)
 
@@ -81,39 +78,43 @@ async def get_or_generate_transcript(video_url: str, video_id: str) -> str:
     transcript_text = None
 
     # ---------------------------------------------------
-    # STEP 2 — Try YouTube transcript API
+    # STEP 2 — Try YouTube captions (cached per video)
     # ---------------------------------------------------
-    try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        transcript_text = " ".join([t["text"] for t in transcript])
-        logger.info("Fetched transcript from YouTube API.")
-    except Exception as e:
-        logger.warning(f"YouTube transcript failed: {e}")
+    transcript_text = await get_caption_text(video_id)
+    if transcript_text:
+        logger.info("Fetched transcript from YouTube captions.")
+
+    # ---------------------------------------------------
+    # STEP 2b — Reuse the filter's clip transcript as a prefix
+    # ---------------------------------------------------
+    if transcript_text is None:
+        partial = await sync_to_async(PartialTranscript.objects.filter(video_id=video_id).first)()
+
+        if partial and partial.is_complete:
+            logger.info(f"Partial transcript covers all of {video_id}")
+            transcript_text = partial.content
+        elif partial:
+            logger.info(f"Reusing first {partial.covered_until:.0f}s transcript for {video_id}")
+            remainder = await transcribe_remainder(video_url, video_id, partial.covered_until)
+            if remainder is not None:
+                transcript_text = "\n".join(t for t in (partial.content, remainder) if t)
 
     # ---------------------------------------------------
     # STEP 3 — Try cached audio files (no re-download)
     # ---------------------------------------------------
     if transcript_text is None:
-        mp3_full = os.path.join(AUDIO_CACHE_DIR, f"{video_id}.mp3")
-        part1 = mp3_full.replace(".mp3", "_part1.mp3")
-        part2 = mp3_full.replace(".mp3", "_part2.mp3")
-
-        if os.path.exists(part1) and os.path.exists(part2):
-            logger.info("Found cached split audio — using it.")
-            transcript_text = ""
-            transcript_text += transcribe_audio_with_whisper(part1) or ""
-            transcript_text += "\n"
-            transcript_text += transcribe_audio_with_whisper(part2) or ""
-            transcript_text = transcript_text.strip()
+        audio_full = audio_cache.get(video_id)
+        cached_parts = find_audio_parts(audio_cache.path_for(video_id))
+
+        if cached_parts:
+            logger.info(f"Found {len(cached_parts)} cached audio parts — using them.")
+            transcript_text = await transcribe_parts(cached_parts)
 
         # If full audio exists but parts don't → split locally
-        elif os.path.exists(mp3_full):
+        elif audio_full:
             logger.info("Found cached full audio — splitting locally.")
-            parts = split_audio_file(mp3_full)
-            transcript_text = ""
-            for part in parts:
-                transcript_text += (transcribe_audio_with_whisper(part) or "") + "\n"
-            transcript_text = transcript_text.strip()
+            parts = await loop.run_in_executor(None, split_audio_file, audio_full)
+            transcript_text = await transcribe_parts(parts)
 
     # ---------------------------------------------------
     # STEP 4 — No cached audio → download audio now
@@ -121,28 +122,16 @@ async def get_or_generate_transcript(video_url: str, video_id: str) -> str:
     if transcript_text is None:
         logger.info(f"No cached audio. Downloading fresh audio for {video_id}...")
 
-        mp3_full = os.path.join(AUDIO_CACHE_DIR, f"{video_id}.mp3")
-        cookie_dir = os.getenv("YTDLP_COOKIES_DIR", "cookies")
-
         # Perform download using cookie rotation (runs in threadpool)
-        downloaded = await loop.run_in_executor(
-            None,
-            rotate_cookies_and_download,
-            video_url,
-            mp3_full,
-            cookie_dir
-        )
+        audio_full = await loop.run_in_executor(None, download_to_cache, video_url, video_id)
 
-        if not downloaded or not os.path.exists(mp3_full):
+        if not audio_full:
             logger.error("Audio download failed.")
             return None
 
         # Split freshly downloaded audio
-        parts = split_audio_file(mp3_full)
-        transcript_text = ""
-        for part in parts:
-            transcript_text += (transcribe_audio_with_whisper(part) or "") + "\n"
-        transcript_text = transcript_text.strip()
+        parts = await loop.run_in_executor(None, split_audio_file, audio_full)
+        transcript_text = await transcribe_parts(parts)
 
     # ---------------------------------------------------
     # STEP 5 — Save transcript to DB
@@ -156,29 +145,116 @@ async def get_or_generate_transcript(video_url: str, video_id: str) -> str:
             video=video_obj,
             content=transcript_text
         )
+        await sync_to_async(PartialTranscript.objects.filter(video_id=video_id).delete)()
 
     return transcript_text
 
 
-def split_audio_file(file_path: str) -> list[str]:
-    """Split audio into 2 parts and return the new file paths"""
+def _trim_start(input_path: str, start: float, output_path: str) -> bool:
+    """Stream-copy everything after `start` seconds into `output_path`."""
     try:
-        audio = AudioSegment.from_file(file_path)
-        half_point = len(audio) // 2
+        (
+            ffmpeg
+            .input(input_path, ss=start)
+            .output(output_path, map="0:a", c="copy")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        return os.path.exists(output_path)
+    except Exception as e:
+        logger.error(f"Audio trimming failed: {e}")
+        return False
+
+
+async def transcribe_remainder(video_url: str, video_id: str, start: float) -> str | None:
+    """
+    Transcribe the audio after `start` seconds. Cuts it from cached full
+    audio if there is any, otherwise downloads only that range.
+    Returns None if the audio could not be obtained.
+    """
+    loop = asyncio.get_event_loop()
+    variant = f"from{int(start)}"
+
+    audio_rest = audio_cache.get(video_id, variant)
+    if not audio_rest:
+        audio_full = audio_cache.get(video_id)
+        if audio_full:
+            audio_rest = await loop.run_in_executor(
+                None, audio_cache.fill, video_id, variant,
+                lambda tmp_path: _trim_start(audio_full, start, tmp_path)
+            )
+        else:
+            audio_rest = await loop.run_in_executor(
+                None, download_to_cache, video_url, video_id, variant, (start, float("inf"))
+            )
+
+    if not audio_rest:
+        logger.warning(f"Could not get audio after {start:.0f}s for {video_id}")
+        return None
+
+    parts = await loop.run_in_executor(None, split_audio_file, audio_rest)
+    if not parts:
+        return None
+    return await transcribe_parts(parts)
 
-        chunk1 = audio[:half_point]
-        chunk2 = audio[half_point:]
 
-        chunk1_path = file_path.replace(".mp3", "_part1.mp3")
-        chunk2_path = file_path.replace(".mp3", "_part2.mp3")
+async def transcribe_parts(parts: list[str]) -> str:
+    """Transcribe audio parts in parallel on the Whisper pool, stitched in order."""
+    return await transcribe_segments(parts)
 
-        chunk1.export(chunk1_path, format="mp3")
-        chunk2.export(chunk2_path, format="mp3")
 
-        logger.info(f"Original duration: {len(audio)} ms")
-        logger.info(f"Part 1: {len(chunk1)} ms, Part 2: {len(chunk2)} ms")
+def _part_path(file_path: str, index: int) -> str:
+    root, ext = os.path.splitext(file_path)
+    return f"{root}_part{index}{ext}"
+
+
+def find_audio_parts(file_path: str) -> list[str]:
+    """Return previously split parts of `file_path` in order, or [] if there are none."""
+    parts = []
+    index = 1
+    while os.path.exists(_part_path(file_path, index)):
+        parts.append(_part_path(file_path, index))
+        index += 1
+    return parts
+
+
+def split_audio_file(file_path: str, parts: int = WHISPER_SEGMENTS) -> list[str]:
+    """
+    Split audio into `parts` time-ordered chunks and return the new file paths.
+    ffmpeg's segment muxer stream-copies packets, so nothing is decoded or
+    re-encoded and memory stays flat however long the video is.
+    """
+    try:
+        for stale in find_audio_parts(file_path):
+            os.remove(stale)
+
+        duration = float(ffmpeg.probe(file_path)["format"]["duration"])
+        parts = max(1, parts)
+        segment_seconds = max(1, math.ceil(duration / parts))
+
+        root, ext = os.path.splitext(file_path)
+        (
+            ffmpeg
+            .input(file_path)
+            .output(
+                f"{root}_part%d{ext}",
+                f="segment",
+                segment_time=segment_seconds,
+                segment_start_number=1,
+                reset_timestamps=1,
+                map="0:a",
+                c="copy",
+            )
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+        chunk_paths = find_audio_parts(file_path)
+        for chunk_path in chunk_paths:
+            audio_cache.register(chunk_path)
+        logger.info(f"Original duration: {duration:.0f} s, {len(chunk_paths)} parts of ~{segment_seconds} s")
 
-        return [chunk1_path, chunk2_path]
+        return chunk_paths
     except Exception as e:
         logger.error(f"Error splitting audio: {str(e)}")
         return []
@@ -197,7 +273,5 @@ def cleanup_audio(file_path: str):
 
 def complete_cleanup():
     """Cleanup all audio files in the cache directory"""
-    if os.path.exists(AUDIO_CACHE_DIR):
-        shutil.rmtree(AUDIO_CACHE_DIR)
-        os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
-        logger.info("Completed full audio cache cleanup.")
\ No newline at end of file
+    audio_cache.clear()
+    logger.info("Completed full audio cache cleanup.")
@@ -0,0 +1,95 @@
+# youtube_videos/transcription_service.py
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.youtube_videos.audio_transcriber import transcribe_audio_with_whisper
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Whisper runs in its own processes so long videos scale with core count and
+# never stall the event loop. Each process loads one model; 0 disables the
+# pool and transcribes in this process instead.
+WHISPER_PROCESSES = int(os.getenv("WHISPER_PROCESSES", str(max(1, (os.cpu_count() or 2) // 2))))
+WHISPER_SEGMENTS = int(os.getenv("WHISPER_SEGMENTS", str(max(2, WHISPER_PROCESSES))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(threads: int):
+    """Split the cores between pool processes instead of every one using them all."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _transcribe_segment(audio_path: str, use_slots: bool = False) -> str:
+    """
+    Pool processes skip transcribe_slots: each has its own copy of the
+    semaphore, so WHISPER_PROCESSES is what caps them.
+    """
+    return transcribe_audio_with_whisper(audio_path, use_slots) or ""
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+
+    if WHISPER_PROCESSES <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 1) // WHISPER_PROCESSES)
+            _pool = ProcessPoolExecutor(
+                max_workers=WHISPER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            logger.info(f"Started Whisper pool: {WHISPER_PROCESSES} processes x {threads} threads")
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def transcribe_segments(segment_paths: list[str]) -> str:
+    """
+    Transcribe time-ordered audio segments in parallel and stitch the text
+    back together in segment order.
+    """
+    if not segment_paths:
+        return ""
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+
+    try:
+        texts = await asyncio.gather(*(
+            # Without a pool the runs share this process's transcribe_slots.
+            loop.run_in_executor(pool, _transcribe_segment, path, pool is None)
+            for path in segment_paths
+        ))
+    except BrokenProcessPool as e:
+        logger.error(f"Whisper pool crashed, transcribing in-process: {e}")
+        _reset_pool()
+        texts = [
+            await loop.run_in_executor(None, _transcribe_segment, path, True)
+            for path in segment_paths
+        ]
+
+    return "\n".join(text.strip() for text in texts if text).strip()
@@ -0,0 +1,110 @@
+# youtube_videos/voice_activity.py
+
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Energy-based voice activity detection. Coding tutorials have long silent
+# stretches while the presenter types; cutting them out before Whisper saves
+# decode time without touching the spoken content.
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+# Frames this loud are voiced whatever the clip's floor, so audio without a
+# quiet stretch (talk over a music bed, steady narration) is kept whole.
+ABSOLUTE_VOICE_DB = float(os.getenv("VAD_ABSOLUTE_DB", "-40"))
+SILENCE_DB = -60
+MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "2.0"))
+PADDING_SECONDS = 0.3
+MIN_SAVING_RATIO = 0.05
+
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> list[tuple[float, float]]:
+    """
+    Return (start, end) seconds of voiced audio. A frame is voiced when its
+    energy is THRESHOLD_DB above the clip's noise floor or above
+    ABSOLUTE_VOICE_DB; gaps shorter than MIN_SILENCE_SECONDS are kept so
+    speech is never cut mid-sentence.
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    count = len(audio) // frame
+    duration = len(audio) / sample_rate
+
+    if count == 0:
+        return [(0.0, duration)] if len(audio) else []
+
+    frames = audio[:count * frame].reshape(count, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    voiced = energy_db > max(min(noise_floor + THRESHOLD_DB, ABSOLUTE_VOICE_DB), SILENCE_DB)
+
+    regions = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            regions.append((start * FRAME_SECONDS, i * FRAME_SECONDS))
+            start = None
+    if start is not None:
+        regions.append((start * FRAME_SECONDS, duration))
+
+    merged = []
+    for region_start, region_end in regions:
+        region_start = max(0.0, region_start - PADDING_SECONDS)
+        region_end = min(duration, region_end + PADDING_SECONDS)
+
+        if merged and region_start - merged[-1][1] < MIN_SILENCE_SECONDS:
+            merged[-1] = (merged[-1][0], region_end)
+        else:
+            merged.append((region_start, region_end))
+
+    return merged
+
+
+class SpeechTimeline:
+    """Maps timestamps in the voiced-only audio back to the original audio."""
+
+    def __init__(self, regions: list[tuple[float, float]]):
+        self.regions = regions
+        self.offsets = []
+        position = 0.0
+        for start, end in regions:
+            self.offsets.append(position)
+            position += end - start
+
+    def to_original(self, seconds: float) -> float:
+        if not self.regions:
+            return seconds
+        index = max(bisect_right(self.offsets, seconds) - 1, 0)
+        return self.regions[index][0] + (seconds - self.offsets[index])
+
+
+def strip_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """
+    Return (voiced_audio, timeline). When there is too little silence to be
+    worth it, or no voiced region is found at all, the audio is returned
+    unchanged with an identity timeline and Whisper makes the call.
+    """
+    duration = len(audio) / sample_rate
+    regions = detect_speech_regions(audio, sample_rate)
+
+    if not regions:
+        return audio, SpeechTimeline([(0.0, duration)])
+
+    voiced_seconds = sum(end - start for start, end in regions)
+    if voiced_seconds > duration * (1 - MIN_SAVING_RATIO):
+        return audio, SpeechTimeline([(0.0, duration)])
+
+    voiced_audio = np.concatenate([
+        audio[int(start * sample_rate):int(end * sample_rate)]
+        for start, end in regions
+    ])
+    logger.info(
+        f"VAD kept {voiced_seconds:.0f}s of {duration:.0f}s audio in {len(regions)} regions"
+    )
+    return voiced_audio, SpeechTimeline(regions)
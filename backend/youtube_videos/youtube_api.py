@@ -1,8 +1,17 @@
 #youtube_api.py
 
+import asyncio
+import hashlib
 import os
+import httpx
 import isodate
 import requests
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+from backend.youtube_videos import http_client
+from backend.youtube_videos.quota import record_quota
+from backend.youtube_videos.transcript_source import get_caption_text
 
 import logging
 logger = logging.getLogger(__name__)
@@ -12,8 +21,29 @@ load_dotenv()
 
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
-def search_youtube_videos(query, max_results):
-    url = "https://www.googleapis.com/youtube/v3/search"
+SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+DETAILS_URL = "https://www.googleapis.com/youtube/v3/videos"
+
+# Search results and video details are cached across processes, keyed by
+# normalized query and by video ID. Empty searches and unknown IDs are
+# cached for a shorter time.
+SEARCH_CACHE_TTL = int(os.getenv("YOUTUBE_SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_NEGATIVE_TTL = int(os.getenv("YOUTUBE_SEARCH_NEGATIVE_TTL", str(3600)))
+DETAILS_CACHE_TTL = int(os.getenv("YOUTUBE_DETAILS_CACHE_TTL", str(7 * 24 * 3600)))
+DETAILS_NEGATIVE_TTL = int(os.getenv("YOUTUBE_DETAILS_NEGATIVE_TTL", str(3600)))
+
+# Paged searches ask for SEARCH_OVERFETCH times the wanted count per page
+# (at most 50, the API maximum) and stop after SEARCH_PAGE_BUDGET pages;
+# each page costs 100 quota units.
+SEARCH_OVERFETCH = int(os.getenv("YOUTUBE_SEARCH_OVERFETCH", "3"))
+SEARCH_PAGE_BUDGET = int(os.getenv("YOUTUBE_SEARCH_PAGE_BUDGET", "3"))
+SEARCH_PAGE_SIZE_MAX = 50
+DETAILS_BATCH_SIZE = 50
+
+pipeline_cache = caches["pipeline"]
+
+
+def _search_params(query, max_results, page_token=None):
     params = {
         "part": "snippet",
         "q": query,
@@ -21,31 +51,24 @@ def search_youtube_videos(query, max_results):
         "maxResults": max_results,
         "key": YOUTUBE_API_KEY
     }
+    if page_token:
+        params["pageToken"] = page_token
+    return params
 
-    response = requests.get(url, params=params)
 
-    if response.status_code != 200:
-        logger.error(f"Error fetching YouTube videos: {response.status_code}")
-        return []
-
-    data = response.json()
-    video_ids = [item["id"]["videoId"] for item in data.get("items", []) if "videoId" in item["id"]]
-    if not video_ids:
-        logger.error("No video IDs found in response.")
-        return []
-    
-    details_url = "https://www.googleapis.com/youtube/v3/videos"
-    details_params = {
+def _details_params(video_ids):
+    return {
         "part": "snippet,contentDetails",
         "id": ','.join(video_ids),
         "key": YOUTUBE_API_KEY
     }
-    details_response = requests.get(details_url, params=details_params)
-    if details_response.status_code != 200:
-        logger.error(f"Error fetching video details: {details_response.status_code}")
-        return []
-    
-    details_data = details_response.json()
+
+
+def _video_ids(data):
+    return [item["id"]["videoId"] for item in data.get("items", []) if "videoId" in item["id"]]
+
+
+def _parse_details(details_data, max_results):
     results = []
     for item in details_data.get("items", []):
         duration_str = item.get("contentDetails", {}).get("duration")
@@ -65,24 +88,243 @@ def search_youtube_videos(query, max_results):
                 "id": item["id"],
                 "title": item["snippet"].get("title", ""),
                 "description": item["snippet"].get("description", ""),
-                "url": f"https://www.youtube.com/watch?v={item['id']}"
+                "url": f"https://www.youtube.com/watch?v={item['id']}",
+                "duration": duration,
             })
 
     return results[:max_results]
-    
-    
-async def get_youtube_transcript(video_id):
-    url = f"https://www.youtube.com/api/timedtext?lang=en&v={video_id}"
-    response = requests.get(url)
 
+
+def _page_size(max_results, max_pages):
+    """Single-page searches ask for exactly max_results; paged ones over-fetch."""
+    if max_pages <= 1:
+        return max_results
+    return min(SEARCH_PAGE_SIZE_MAX, max(max_results, max_results * SEARCH_OVERFETCH))
+
+
+def _search_cache_key(query, page_size, page_token):
+    normalized = " ".join(query.lower().split())
+    digest = hashlib.sha256(f"{normalized}|{page_size}|{page_token or ''}".encode()).hexdigest()
+    return f"yt_search:{digest}"
+
+
+def _details_cache_key(video_id):
+    return f"yt_video:{video_id}"
+
+
+def _split_cached_details(video_ids, cached):
+    """Return ({id: item}, [ids still to fetch]); False marks a cached miss."""
+    items = {}
+    missing = []
+    for video_id in video_ids:
+        item = cached.get(_details_cache_key(video_id))
+        if item is None:
+            missing.append(video_id)
+        elif item:
+            items[video_id] = item
+    return items, missing
+
+
+def _details_cache_entries(video_ids, fetched_items):
+    found = {item["id"]: item for item in fetched_items}
+    hits = {_details_cache_key(i): found[i] for i in video_ids if i in found}
+    misses = {_details_cache_key(i): False for i in video_ids if i not in found}
+    return found, hits, misses
+
+
+def _chunks(video_ids):
+    return [video_ids[i:i + DETAILS_BATCH_SIZE] for i in range(0, len(video_ids), DETAILS_BATCH_SIZE)]
+
+
+def _fetch_search_page(query, page_size, page_token):
+    """{"ids": [...], "next": token} for one search page, or None if the request failed."""
+    try:
+        response = http_client.get(SEARCH_URL, params=_search_params(query, page_size, page_token))
+    except requests.RequestException as e:
+        logger.error(f"Error fetching YouTube videos: {e}")
+        return None
+
+    record_quota("search")
     if response.status_code != 200:
+        logger.error(f"Error fetching YouTube videos: {response.status_code}")
         return None
 
+    data = response.json()
+    return {"ids": _video_ids(data), "next": data.get("nextPageToken")}
+
+
+def _search_page(query, page_size, page_token=None):
+    key = _search_cache_key(query, page_size, page_token)
+    page = pipeline_cache.get(key)
+    if page is not None:
+        logger.info(f"YouTube search cache hit: {query}")
+        return page
+
+    page = _fetch_search_page(query, page_size, page_token)
+    if page is not None:
+        pipeline_cache.set(key, page, SEARCH_CACHE_TTL if page["ids"] else SEARCH_NEGATIVE_TTL)
+    return page
+
+
+def _fetch_details(video_ids):
+    """Details items for at most DETAILS_BATCH_SIZE IDs, or None if the request failed."""
     try:
-        import xml.etree.ElementTree as ET
-        root = ET.fromstring(response.text)
-        transcript = ' '.join([node.text for node in root.findall('.//text') if node.text])
-        return transcript if transcript else None
-    except Exception as e:
-        logger.error(f"[Transcript Parsing Error] {e}")
-        return None
\ No newline at end of file
+        response = http_client.get(DETAILS_URL, params=_details_params(video_ids))
+    except requests.RequestException as e:
+        logger.error(f"Error fetching video details: {e}")
+        return None
+
+    record_quota("videos")
+    if response.status_code != 200:
+        logger.error(f"Error fetching video details: {response.status_code}")
+        return None
+    return response.json().get("items", [])
+
+
+def _video_details(video_ids):
+    """Details items in `video_ids` order, from cache or one API call per 50 IDs. None on failure."""
+    items, missing = _split_cached_details(
+        video_ids, pipeline_cache.get_many([_details_cache_key(i) for i in video_ids])
+    )
+    for chunk in _chunks(missing):
+        fetched = _fetch_details(chunk)
+        if fetched is None:
+            return None
+        found, hits, misses = _details_cache_entries(chunk, fetched)
+        pipeline_cache.set_many(hits, DETAILS_CACHE_TTL)
+        pipeline_cache.set_many(misses, DETAILS_NEGATIVE_TTL)
+        items.update(found)
+
+    return [items[i] for i in video_ids if i in items]
+
+
+def search_youtube_videos(query, max_results, max_pages=1):
+    """
+    Up to `max_results` videos of 10-60 minutes. With `max_pages` > 1 it
+    over-fetches and follows nextPageToken until enough videos survive the
+    duration filter or the page budget is spent.
+    """
+    page_size = _page_size(max_results, max_pages)
+    results = []
+    seen = set()
+    page_token = None
+
+    for _ in range(max(1, max_pages)):
+        page = _search_page(query, page_size, page_token)
+        if page is None:
+            break
+
+        new_ids = [i for i in page["ids"] if i not in seen]
+        seen.update(new_ids)
+        if new_ids:
+            details = _video_details(new_ids)
+            if details is None:
+                break
+            results.extend(_parse_details({"items": details}, max_results - len(results)))
+
+        page_token = page["next"]
+        if len(results) >= max_results or not page_token:
+            break
+
+    if not seen:
+        logger.error("No video IDs found in response.")
+    return results[:max_results]
+
+
+async def _afetch_search_page(query, page_size, page_token):
+    try:
+        response = await http_client.aget(SEARCH_URL, params=_search_params(query, page_size, page_token))
+    except httpx.HTTPError as e:
+        logger.error(f"Error fetching YouTube videos: {e}")
+        return None
+
+    await sync_to_async(record_quota)("search")
+    if response.status_code != 200:
+        logger.error(f"Error fetching YouTube videos: {response.status_code}")
+        return None
+
+    data = response.json()
+    return {"ids": _video_ids(data), "next": data.get("nextPageToken")}
+
+
+async def _asearch_page(query, page_size, page_token=None):
+    key = _search_cache_key(query, page_size, page_token)
+    page = await pipeline_cache.aget(key)
+    if page is not None:
+        logger.info(f"YouTube search cache hit: {query}")
+        return page
+
+    page = await _afetch_search_page(query, page_size, page_token)
+    if page is not None:
+        await pipeline_cache.aset(key, page, SEARCH_CACHE_TTL if page["ids"] else SEARCH_NEGATIVE_TTL)
+    return page
+
+
+async def _afetch_details(video_ids):
+    try:
+        response = await http_client.aget(DETAILS_URL, params=_details_params(video_ids))
+    except httpx.HTTPError as e:
+        logger.error(f"Error fetching video details: {e}")
+        return None
+
+    await sync_to_async(record_quota)("videos")
+    if response.status_code != 200:
+        logger.error(f"Error fetching video details: {response.status_code}")
+        return None
+    return response.json().get("items", [])
+
+
+async def _avideo_details(video_ids):
+    items, missing = _split_cached_details(
+        video_ids, await pipeline_cache.aget_many([_details_cache_key(i) for i in video_ids])
+    )
+    fetched_chunks = await asyncio.gather(*(_afetch_details(chunk) for chunk in _chunks(missing)))
+
+    for chunk, fetched in zip(_chunks(missing), fetched_chunks):
+        if fetched is None:
+            return None
+        found, hits, misses = _details_cache_entries(chunk, fetched)
+        await pipeline_cache.aset_many(hits, DETAILS_CACHE_TTL)
+        await pipeline_cache.aset_many(misses, DETAILS_NEGATIVE_TTL)
+        items.update(found)
+
+    return [items[i] for i in video_ids if i in items]
+
+
+async def search_youtube_videos_async(query, max_results, max_pages=1):
+    """search_youtube_videos on the shared pooled async client."""
+    page_size = _page_size(max_results, max_pages)
+    results = []
+    seen = set()
+    page_token = None
+
+    for _ in range(max(1, max_pages)):
+        page = await _asearch_page(query, page_size, page_token)
+        if page is None:
+            break
+
+        new_ids = [i for i in page["ids"] if i not in seen]
+        seen.update(new_ids)
+        if new_ids:
+            details = await _avideo_details(new_ids)
+            if details is None:
+                break
+            results.extend(_parse_details({"items": details}, max_results - len(results)))
+
+        page_token = page["next"]
+        if len(results) >= max_results or not page_token:
+            break
+
+    if not seen:
+        logger.error("No video IDs found in response.")
+    return results[:max_results]
+
+
+async def search_many(queries, max_results):
+    """Run several searches concurrently; results come back in query order."""
+    return await asyncio.gather(*(search_youtube_videos_async(q, max_results) for q in queries))
+    
+    
+async def get_youtube_transcript(video_id):
+    """Caption text for a video, or None. Served from the shared caption cache."""
+    return await get_caption_text(video_id)
@@ -1,6 +1,5 @@
 #youtube_videos/youtube_fetcher.py
 
-import asyncio
 import sys
 import os
 import tempfile
@@ -15,7 +14,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from question_generator.generator import generate_questions
 from youtube_videos.transcript_utils import get_or_generate_transcript
-from youtube_videos.youtube_api import search_youtube_videos, get_youtube_transcript
+from youtube_videos.youtube_api import SEARCH_PAGE_BUDGET, search_youtube_videos, get_youtube_transcript
 from youtube_videos.utils import extract_video_id
 from youtube_videos.cleanup_utils import cleanup_video_audio
 
@@ -64,21 +63,12 @@ async def process_video(video_title, video_desc, video_url, topic_name, language
         logger.info("Transcript saved/updated in DB.")
 
     if transcript:
-        max_retries = 5
-        backoff = 5
-        for attempt in range(max_retries):
-            try:
-                logger.info("Generating coding questions...")
-                await generate_questions(transcript, video_id)
-                break
-            except Exception as e:
-                if "429" in str(e) and attempt < max_retries - 1:
-                    logger.warning(f"429 Too Many Requests, retrying in {backoff} sec...")
-                    await asyncio.sleep(backoff)
-                    backoff *= 2
-                else:
-                    logger.error(f"Error generating questions: {e}")
-                    break
+        # Groq rate limits are retried inside the LLM gateway.
+        try:
+            logger.info("Generating coding questions...")
+            await generate_questions(transcript, video_id)
+        except Exception as e:
+            logger.error(f"Error generating questions: {e}")
 
     try:
         cleanup_video_audio(video_id)
@@ -88,5 +78,5 @@ async def process_video(video_title, video_desc, video_url, topic_name, language
 
 
 def fetch_videos(query, max_results=5):
-    return search_youtube_videos(query, max_results)
+    return search_youtube_videos(query, max_results, max_pages=SEARCH_PAGE_BUDGET)
 
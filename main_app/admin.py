@@ -1,7 +1,7 @@
 # main_app/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Language, Topic, Roadmap, Definition, User, Video, Question, Transcript
+from .models import Language, Topic, Roadmap, Definition, User, Video, Question, Transcript, PipelineJob, ApiQuotaUsage
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -114,3 +114,17 @@ class QuestionAdmin(admin.ModelAdmin):
     def questions_preview(self, obj):
         return (obj.questions[:80] + '...') if len(obj.questions) > 80 else obj.questions
     questions_preview.short_description = 'Questions'
+
+
+@admin.register(PipelineJob)
+class PipelineJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic_name', 'language', 'user', 'status', 'attempts', 'worker_id', 'created_at']
+    list_filter = ['status', 'language']
+    search_fields = ['topic_name', 'user__username']
+    list_display_links = ['id', 'topic_name']
+
+
+@admin.register(ApiQuotaUsage)
+class ApiQuotaUsageAdmin(admin.ModelAdmin):
+    list_display = ['day', 'units', 'requests']
+    ordering = ['-day']
@@ -0,0 +1,25 @@
+# main_app/management/commands/backfill_topics.py
+
+from django.core.management.base import BaseCommand
+
+from backend.task_queue import enqueue_topic
+from main_app.models import Roadmap
+
+
+class Command(BaseCommand):
+    help = "Queue every roadmap topic of a language at backfill priority."
+
+    def add_arguments(self, parser):
+        parser.add_argument("language", help="Language whose roadmap topics should be processed.")
+
+    def handle(self, *args, **options):
+        language = options["language"].lower()
+        roadmap = Roadmap.objects.filter(language__name=language).first()
+
+        if not roadmap or not roadmap.topics:
+            self.stderr.write(f"No roadmap found for {language}")
+            return
+
+        for topic_name in roadmap.topics:
+            result = enqueue_topic(language, topic_name)
+            self.stdout.write(f"{topic_name}: {result}")
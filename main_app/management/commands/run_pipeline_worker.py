@@ -0,0 +1,31 @@
+# main_app/management/commands/run_pipeline_worker.py
+
+from django.core.management.base import BaseCommand
+
+from backend.task_queue import POOL_SIZE, WORKER_ID, start_worker_pool
+from backend.youtube_videos.audio_transcriber import get_whisper_model
+
+
+class Command(BaseCommand):
+    help = "Drain the shared PipelineJob queue in a dedicated worker process."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=POOL_SIZE,
+            help="Number of concurrent pipeline workers (default: PIPELINE_WORKERS).",
+        )
+        parser.add_argument(
+            "--preload-whisper",
+            action="store_true",
+            help="Load the Whisper model at startup instead of on the first transcription.",
+        )
+
+    def handle(self, *args, **options):
+        if options["preload_whisper"]:
+            get_whisper_model()
+
+        self.stdout.write(f"Starting {options['workers']} pipeline workers in {WORKER_ID}")
+        for t in start_worker_pool(options["workers"]):
+            t.join()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_pipelinejob'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='pipelinejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('user',), name='one_queued_job_per_user'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_pipelinejob_one_queued_job_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelinejob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Interactive'), (1, 'Prefetch'), (2, 'Backfill')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='pipelinejob',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='main_app_pi_status_2f8e9f_idx'),
+        ),
+    ]
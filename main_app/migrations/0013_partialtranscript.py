@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_pipelinejob_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartialTranscript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=50, unique=True)),
+                ('content', models.TextField(blank=True)),
+                ('covered_until', models.FloatField()),
+                ('is_complete', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
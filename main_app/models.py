@@ -105,6 +105,21 @@ class Transcript(models.Model):
         return f"Transcript for {self.video.title or self.video.video_id}"
 
 
+class PartialTranscript(models.Model):
+    """
+    Transcript of the first `covered_until` seconds of a video, produced while
+    filtering. The full pipeline transcribes only the audio after it.
+    """
+    video_id = models.CharField(max_length=50, unique=True)
+    content = models.TextField(blank=True)
+    covered_until = models.FloatField()
+    is_complete = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Partial transcript for {self.video_id} (0-{self.covered_until:.0f}s)"
+
+
 class Question(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="questions", null=True, blank=True)
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="user_coding_problems", null=True, blank=True)
@@ -112,3 +127,70 @@ class Question(models.Model):
 
     def __str__(self):
         return f"Questions for {self.user} - {self.video.video_id if self.video else 'No Video'}"
+
+
+class PipelineJob(models.Model):
+    """Persistent topic pipeline job shared by every web and worker process."""
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    PRIORITY_INTERACTIVE = 0
+    PRIORITY_PREFETCH = 1
+    PRIORITY_BACKFILL = 2
+
+    PRIORITY_CHOICES = [
+        (PRIORITY_INTERACTIVE, "Interactive"),
+        (PRIORITY_PREFETCH, "Prefetch"),
+        (PRIORITY_BACKFILL, "Backfill"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pipeline_jobs", null=True, blank=True)
+    language = models.CharField(max_length=100)
+    topic_name = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_INTERACTIVE)
+
+    worker_id = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["status", "priority", "created_at"]),
+            models.Index(fields=["user", "status"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status="queued"),
+                name="one_queued_job_per_user",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.language} / {self.topic_name} ({self.status})"
+
+
+class ApiQuotaUsage(models.Model):
+    """YouTube Data API quota units spent per day (Pacific time, when Google resets it)."""
+    day = models.DateField(unique=True)
+    units = models.PositiveIntegerField(default=0)
+    requests = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.units} units"
@@ -1,3 +1,422 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from backend.task_queue import (
+    DEFAULT_CLASS_WEIGHTS, MAX_ATTEMPTS, _parse_class_weights, claim_next_job,
+    requeue_expired_jobs, upsert_user_task,
+)
+from backend.filter_videos.filter_pipeline import _metadata_matcher
+from backend.youtube_videos import caption_client, cookie_manager, http_client, transcript_source
+from backend.youtube_videos.audio_cache import EVICTION_GRACE_SECONDS, AudioCache
+from backend.youtube_videos.audio_transcriber import SAMPLES_PER_TIMESTAMP, _seek_window
+from backend.youtube_videos.caption_client import CaptionFetchError
+from backend.youtube_videos.voice_activity import SAMPLE_RATE, strip_silence
+from main_app.models import Language, PipelineJob, Topic, User
+
+
+class PipelineQueueTests(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(name="python")
+        for name in ("Recursion", "Sorting"):
+            Topic.objects.create(language=self.language, name=name)
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+
+    def topic(self, name):
+        return Topic.objects.get(language=self.language, name=name)
+
+    def expire(self, job):
+        PipelineJob.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    # --- claim_next_job ---
+
+    def test_claim_marks_job_running_and_locks_topic(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+
+        job = claim_next_job("worker-1")
+
+        self.assertEqual(job.status, PipelineJob.STATUS_RUNNING)
+        self.assertEqual(job.worker_id, "worker-1")
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.lease_expires_at, timezone.now())
+        self.assertTrue(self.topic("Recursion").is_processing)
+
+    def test_claim_skips_topic_already_being_processed(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        upsert_user_task(self.bob.id, "python", "Recursion")
+
+        self.assertIsNotNone(claim_next_job("worker-1"))
+        self.assertIsNone(claim_next_job("worker-2"))
+
+    def test_claim_fails_job_for_missing_topic(self):
+        upsert_user_task(self.alice.id, "python", "Graphs")
+
+        self.assertIsNone(claim_next_job("worker-1"))
+        self.assertEqual(PipelineJob.objects.get().status, PipelineJob.STATUS_FAILED)
+
+    # --- lease expiry ---
+
+    def test_expired_lease_requeues_job_and_frees_topic(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        job = claim_next_job("worker-1")
+        self.expire(job)
+
+        requeue_expired_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PipelineJob.STATUS_QUEUED)
+        self.assertEqual(job.worker_id, "")
+        self.assertFalse(self.topic("Recursion").is_processing)
+
+    def test_live_lease_is_not_requeued(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        job = claim_next_job("worker-1")
+
+        requeue_expired_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PipelineJob.STATUS_RUNNING)
+
+    def test_expired_lease_fails_job_after_max_attempts(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        job = claim_next_job("worker-1")
+        PipelineJob.objects.filter(pk=job.pk).update(attempts=MAX_ATTEMPTS)
+        self.expire(job)
+
+        requeue_expired_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PipelineJob.STATUS_FAILED)
+
+    def test_expired_lease_with_newer_queued_job_does_not_stall_queue(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        running = claim_next_job("worker-1")
+        upsert_user_task(self.alice.id, "python", "Sorting")
+        upsert_user_task(self.bob.id, "python", "Recursion")
+        self.expire(running)
+
+        # Requeueing the expired job would violate one_queued_job_per_user.
+        claimed = claim_next_job("worker-2")
+
+        running.refresh_from_db()
+        self.assertEqual(running.status, PipelineJob.STATUS_FAILED)
+        self.assertIsNotNone(claimed)
+        self.assertEqual(
+            PipelineJob.objects.filter(user=self.alice, status=PipelineJob.STATUS_QUEUED).count()
+            + PipelineJob.objects.filter(user=self.alice, status=PipelineJob.STATUS_RUNNING).count(),
+            1
+        )
+
+    def test_topic_locked_without_running_job_is_released(self):
+        Topic.objects.filter(pk=self.topic("Recursion").pk).update(is_processing=True)
+        upsert_user_task(self.alice.id, "python", "Recursion")
+
+        job = claim_next_job("worker-1")
+
+        self.assertIsNotNone(job)
+        self.assertEqual(job.topic_name, "Recursion")
+
+    def test_topic_lock_of_running_job_is_kept(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        claim_next_job("worker-1")
+
+        requeue_expired_jobs()
+
+        self.assertTrue(self.topic("Recursion").is_processing)
+
+    # --- upsert_user_task ---
+
+    def test_upsert_same_topic_is_unchanged(self):
+        self.assertEqual(upsert_user_task(self.alice.id, "python", "Recursion"), "replaced")
+        self.assertEqual(upsert_user_task(self.alice.id, "python", "Recursion"), "unchanged")
+        self.assertEqual(PipelineJob.objects.count(), 1)
+
+    def test_upsert_new_topic_replaces_queued_row_in_place(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        first = PipelineJob.objects.get()
+
+        self.assertEqual(upsert_user_task(self.alice.id, "python", "Sorting"), "replaced")
+
+        job = PipelineJob.objects.get()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.topic_name, "Sorting")
+
+    def test_upsert_does_not_touch_running_job(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        running = claim_next_job("worker-1")
+
+        upsert_user_task(self.alice.id, "python", "Sorting")
+
+        running.refresh_from_db()
+        self.assertEqual(running.status, PipelineJob.STATUS_RUNNING)
+        self.assertEqual(running.topic_name, "Recursion")
+        self.assertEqual(
+            PipelineJob.objects.get(status=PipelineJob.STATUS_QUEUED).topic_name, "Sorting"
+        )
+
+    def test_cancel_videos_removes_only_the_users_queued_job(self):
+        upsert_user_task(self.alice.id, "python", "Recursion")
+        upsert_user_task(self.bob.id, "python", "Sorting")
+        self.client.force_login(self.alice)
+
+        response = self.client.post("/cancel_videos/", secure=True)
+
+        self.assertEqual(response.json(), {"status": "cancelled"})
+        self.assertEqual(list(PipelineJob.objects.values_list("user_id", flat=True)), [self.bob.id])
+        self.assertEqual(self.client.post("/cancel_videos/", secure=True).json(), {"status": "noop"})
+
+    # --- scheduling ---
+
+    def test_class_weights_fill_missing_and_invalid_values(self):
+        self.assertEqual(
+            _parse_class_weights("5"),
+            {**DEFAULT_CLASS_WEIGHTS, PipelineJob.PRIORITY_INTERACTIVE: 5}
+        )
+        self.assertEqual(_parse_class_weights("x,0,2")[PipelineJob.PRIORITY_BACKFILL], 2)
+        self.assertEqual(_parse_class_weights("x,0,2")[PipelineJob.PRIORITY_INTERACTIVE],
+                         DEFAULT_CLASS_WEIGHTS[PipelineJob.PRIORITY_INTERACTIVE])
+
+
+class CaptionCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache = LocMemCache("captions-test", {})
+        cache.clear()
+        patcher = mock.patch.object(transcript_source, "pipeline_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_captions(self, fetch):
+        with mock.patch.object(transcript_source, "fetch_captions", fetch):
+            return async_to_sync(transcript_source.get_captions)("vid")
+
+    def test_confirmed_absence_is_cached(self):
+        fetch = mock.AsyncMock(return_value=None)
+
+        self.assertIsNone(self.get_captions(fetch))
+        self.assertIsNone(self.get_captions(fetch))
+        self.assertEqual(fetch.await_count, 1)
+
+    def test_failed_lookup_is_not_cached(self):
+        self.assertIsNone(self.get_captions(mock.AsyncMock(side_effect=CaptionFetchError("timeout"))))
+
+        segments = [{"text": "hi", "start": 0, "duration": 1}]
+        self.assertEqual(self.get_captions(mock.AsyncMock(return_value=segments)), segments)
+
+
+class CaptionLibraryTests(SimpleTestCase):
+    def fetch(self, **kwargs):
+        with mock.patch.object(caption_client.YouTubeTranscriptApi, "fetch", **kwargs):
+            return caption_client._fetch_with_library("vid", ["en"])
+
+    def test_returns_raw_segments(self):
+        transcript = mock.Mock()
+        transcript.to_raw_data.return_value = [{"text": "hi", "start": 0.0, "duration": 1.0}]
+
+        self.assertEqual(self.fetch(return_value=transcript), [{"text": "hi", "start": 0.0, "duration": 1.0}])
+
+    def test_disabled_transcripts_are_a_confirmed_absence(self):
+        self.assertIsNone(self.fetch(side_effect=caption_client.TranscriptsDisabled("vid")))
+
+    def test_request_failure_is_an_error(self):
+        with self.assertRaises(CaptionFetchError):
+            self.fetch(side_effect=ConnectionError("reset"))
+
+
+class SharedAsyncClientTests(SimpleTestCase):
+    def test_requests_from_separate_loops_share_one_client(self):
+        clients = []
+
+        async def fake_get(client, url, **kwargs):
+            clients.append(client)
+            self.assertIs(asyncio.get_running_loop(), http_client.get_io_loop())
+            return httpx.Response(200, text="ok")
+
+        with mock.patch.object(httpx.AsyncClient, "get", fake_get):
+            for _ in range(2):
+                # Each async_to_sync call from a plain thread runs a fresh loop.
+                response = async_to_sync(http_client.aget)("https://example.com/")
+
+        self.assertEqual(response.text, "ok")
+        self.assertEqual(len(clients), 2)
+        self.assertIs(clients[0], clients[1])
+        self.assertFalse(clients[0].is_closed)
+
+
+class AudioCacheTests(SimpleTestCase):
+    """Two AudioCache instances on one directory stand in for two worker processes."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def write(self, cache, video_id, variant, size=100, age=0):
+        path = cache.path_for(video_id, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        cache.register(path)
+        return path
+
+    def test_budget_counts_other_processes_files(self):
+        first = AudioCache(self.directory, max_bytes=150)
+        second = AudioCache(self.directory, max_bytes=150)
+
+        old = self.write(first, "a", "full", age=EVICTION_GRACE_SECONDS + 60)
+        new = self.write(second, "b", "full")
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+        self.assertEqual(second.size_bytes(), 100)
+
+    def test_discard_removes_other_processes_parts(self):
+        first = AudioCache(self.directory, max_bytes=10 ** 6)
+        second = AudioCache(self.directory, max_bytes=10 ** 6)
+        part = self.write(first, "a", "full_part0")
+        other = self.write(first, "ab", "full")
+
+        second.discard("a")
+
+        self.assertFalse(os.path.exists(part))
+        self.assertTrue(os.path.exists(other))
+        self.assertEqual(first.size_bytes(), 100)
+
+    def test_writes_under_budget_do_not_list_the_directory(self):
+        cache = AudioCache(self.directory, max_bytes=10 ** 6)
+        self.write(cache, "a", "full")
+
+        with mock.patch.object(cache, "_scan") as scan:
+            self.write(cache, "b", "full")
+            cache.discard("a")
+
+        scan.assert_not_called()
+        self.assertEqual(cache.size_bytes(), 100)
+
+    def test_fill_counts_a_replaced_file_once(self):
+        cache = AudioCache(self.directory, max_bytes=10 ** 6)
+
+        def producer(size):
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    f.write(b"x" * size)
+                return True
+            return write
+
+        cache.fill("a", "full", producer(100))
+        path = cache.fill("a", "full", producer(40))
+
+        self.assertEqual(cache.get("a"), path)
+        self.assertEqual(cache.size_bytes(), 40)
+
+
+class MetadataMatcherTests(SimpleTestCase):
+    def matches_language(self, language, text):
+        return bool(_metadata_matcher(language, "recursion")[0].search(text))
+
+    def test_language_may_carry_a_version(self):
+        self.assertTrue(self.matches_language("python", "python3 recursion"))
+        self.assertTrue(self.matches_language("java", "java8 streams"))
+        self.assertTrue(self.matches_language("c++", "c++17 sorting"))
+
+    def test_language_must_be_a_whole_token(self):
+        self.assertFalse(self.matches_language("java", "javascript recursion"))
+        self.assertFalse(self.matches_language("c", "c++ recursion"))
+        self.assertFalse(self.matches_language("c", "c# recursion"))
+
+
+class SeekWindowTests(SimpleTestCase):
+    TS = 1000  # first timestamp token
+    WINDOW = 30 * SAMPLE_RATE
+
+    def ts(self, seconds):
+        return self.TS + int(seconds / 0.02)
+
+    def test_window_ending_mid_segment_resumes_at_last_complete_segment(self):
+        # <0.0> a <5.0><5.0> b <12.0><12.0> c (cut off)
+        tokens = [self.ts(0), 1, self.ts(5), self.ts(5), 2, self.ts(12), self.ts(12), 3]
+
+        kept, advance = _seek_window(tokens, self.TS, self.WINDOW)
+
+        self.assertEqual(kept, tokens[:6])
+        self.assertEqual(advance, 600 * SAMPLES_PER_TIMESTAMP)
+
+    def test_window_ending_on_a_timestamp_is_consumed_whole(self):
+        tokens = [self.ts(0), 1, self.ts(5), self.ts(5), 2, self.ts(30)]
+
+        self.assertEqual(_seek_window(tokens, self.TS, self.WINDOW), (tokens, self.WINDOW))
+
+    def test_window_without_segments_is_consumed_whole(self):
+        self.assertEqual(_seek_window([1, 2, 3], self.TS, self.WINDOW), ([1, 2, 3], self.WINDOW))
+
+
+class VoiceActivityTests(SimpleTestCase):
+    def tone(self, seconds, db, frequency=220):
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        return (10 ** (db / 20) * np.sqrt(2) * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+    def test_continuous_speech_is_kept(self):
+        audio = self.tone(60, -20)
+
+        voiced, _ = strip_silence(audio)
+
+        self.assertEqual(len(voiced), len(audio))
+
+    def test_speech_over_music_bed_is_kept(self):
+        t = np.arange(60 * SAMPLE_RATE) / SAMPLE_RATE
+        envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t)
+        audio = self.tone(60, -30, 110) + self.tone(60, -15) * envelope.astype(np.float32)
+
+        voiced, _ = strip_silence(audio)
+
+        self.assertEqual(len(voiced), len(audio))
+
+    def test_long_silence_is_cut(self):
+        audio = np.concatenate([self.tone(10, -20), np.zeros(20 * SAMPLE_RATE, np.float32), self.tone(10, -20)])
+
+        voiced, timeline = strip_silence(audio)
+
+        self.assertLess(len(voiced), 25 * SAMPLE_RATE)
+        self.assertAlmostEqual(timeline.to_original(15), 35, delta=1)
+
+
+class DownloadCleanupTests(SimpleTestCase):
+    def test_failed_download_leaves_no_source_files(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output_path = os.path.join(directory.name, ".vid.head300.tmp.opus")
+
+        class FailingDownload:
+            def __init__(self, opts):
+                self.template = opts["outtmpl"]
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def download(self, urls):
+                open(self.template.replace("%(ext)s", "webm.part"), "w").close()
+                raise cookie_manager.yt_dlp.utils.DownloadError("connection reset")
+
+        with mock.patch.object(cookie_manager.yt_dlp, "YoutubeDL", FailingDownload):
+            ok = cookie_manager.download_with_cookie("https://youtu.be/vid", None, output_path, profile="whisper")
+
+        self.assertFalse(ok)
+        self.assertEqual(os.listdir(directory.name), [])
@@ -20,9 +20,11 @@ urlpatterns = [
     path("set-language/", views.set_language, name="set_language"),
     path("get_topic/", views.get_topic, name="get_topic"),
     path("get_videos/", views.get_videos, name="get_videos"),
+    path("cancel_videos/", views.cancel_videos, name="cancel_videos"),
     path("questions/", views.question_page, name="question_page"),
     path("get_questions/", views.get_questions, name="get_questions"),
     path("get_filtered_videos/", views.get_filtered_videos, name="get_filtered_videos"),
+    path("pipeline_stats/", views.pipeline_stats, name="pipeline_stats"),
     path("run_code/", views.run_code, name="run_code"),
     path("verify/", views.verify_email, name="verify_email"),
     path("resend_otp/", views.resend_otp, name="resend_otp"),
@@ -13,7 +13,7 @@ import random
 import string
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_GET
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import render, redirect
 
 from django.contrib import messages
@@ -24,7 +24,9 @@ from backend.code_evaluator.judge0_executor import submit_code
 from django.contrib.auth import authenticate, login
 from backend.filter_videos.fetch_videos_youtube import fetching_videos
 from main_app.models import Language, Question, Roadmap, Topic, Transcript, User, Video, EmailVerification
-from backend.task_queue import upsert_user_task, start_worker_once
+from backend.task_queue import upsert_user_task, remove_user_task, start_worker_once, queue_stats, prefetch_next_topic
+from backend.youtube_videos.quota import quota_stats
+from backend import llm_gateway
 
 
 resend.api_key = settings.RESEND_API_KEY
@@ -165,6 +167,7 @@ def get_videos(request):
         language=language,
         topic_name=topic_name
     )
+    prefetch_next_topic(language, topic_name)
 
     start_worker_once()
 
@@ -173,6 +176,23 @@ def get_videos(request):
         "queue_action": queue_action
     })
 
+@require_POST
+@login_required
+def cancel_videos(request):
+    """Withdraw the user's queued video request. A job already running finishes."""
+    return JsonResponse({
+        "status": "cancelled" if remove_user_task(request.user.id) else "noop"
+    })
+
+@require_GET
+@user_passes_test(lambda u: u.is_staff, login_url='/login/')
+def pipeline_stats(request):
+    return JsonResponse({
+        **queue_stats(),
+        "youtube_quota": quota_stats(),
+        "llm_cache": llm_gateway.cache_stats(),
+    })
+
 @require_GET
 def get_filtered_videos(request):
     language = request.GET.get("language")
@@ -139,6 +139,30 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Caches
+# "pipeline" is file-based so every web and worker process on the host
+# shares it (keyword expansions, API lookups).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pipeline': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("PIPELINE_CACHE_DIR", os.path.join(BASE_DIR, 'cache', 'pipeline')),
+        'TIMEOUT': 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # LLM responses, keyed by a hash of the full request (see backend/llm_gateway.py).
+    'llm': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("LLM_CACHE_DIR", os.path.join(BASE_DIR, 'cache', 'llm')),
+        'TIMEOUT': 30 * 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 